@@ -0,0 +1,152 @@
+import csv
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+
+from metricas import metricas
+
+# Escolha do armazenamento: "csv" (padrão) ou "sqlite".
+ARMAZENAMENTO = os.environ.get("VOOS_ARMAZENAMENTO", "csv")
+SQLITE_FILE = os.environ.get("VOOS_SQLITE", "voos.db")
+
+HEADER = ["id_voo", "numero_voo", "cia", "origem",
+          "destino", "horario_partida", "horario_chegada",
+          "id_aeronave", "status"]
+
+# Colunas que a listagem aceita como filtro de igualdade.
+CAMPOS_INDEXADOS = ["cia", "origem", "destino", "status"]
+
+# Permissões de um arquivo novo, segundo a umask do processo.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+PERMISSOES_NOVO = 0o666 & ~_UMASK
+
+
+class VooDuplicado(Exception):
+    pass
+
+
+# Os temporários do tempfile.mkstemp nascem com permissão 0600; antes de
+# trocar um arquivo pelo temporário, o temporário recebe as permissões dele,
+# ou as de um arquivo novo se ele ainda não existe.
+def copiar_permissoes(destino, temporario):
+    try:
+        shutil.copymode(destino, temporario)
+    except FileNotFoundError:
+        os.chmod(temporario, PERMISSOES_NOVO)
+
+
+# Escrita atômica de um CSV: o cabeçalho e os registros vão para um
+# temporário ao lado de destino, com fsync, e só então o temporário toma o
+# lugar de destino com os.replace, para que um leitor nunca veja o arquivo
+# pela metade. gravar_temporario() e substituir() ficam separados para quem
+# precisa gravar fora de um lock e trocar dentro dele.
+def gravar_temporario(destino, header, registros):
+    diretorio = os.path.dirname(os.path.abspath(destino))
+    fd, temporario = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline="") as file:
+            copiar_permissoes(destino, temporario)
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(registro.para_csv() for registro in registros)
+            file.flush()
+            os.fsync(file.fileno())
+            metricas.bytes_escritos(os.fstat(file.fileno()).st_size)
+    except BaseException:
+        os.remove(temporario)
+        raise
+    return temporario
+
+
+def substituir(temporario, destino):
+    try:
+        os.replace(temporario, destino)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+
+def gravar_csv(destino, header, registros):
+    substituir(gravar_temporario(destino, header, registros), destino)
+
+
+# Interface comum dos armazenamentos de voos. Os voos entram e saem como
+# registro.RegistroVoo.
+#
+# caminho_csv é um CSV com todos os voos, atualizado por consolidar(); é o
+# arquivo usado pelo /hash/ e pelo /voos/compactar.
+class Armazenamento(ABC):
+    header = None
+    caminho_csv = None
+
+    def __init__(self):
+        # Funções chamadas como f(stat antes, bytes anexados, stat depois)
+        # sempre que linhas são só anexadas ao final de caminho_csv.
+        self.observadores_anexacao = []
+
+    def carregar(self):
+        pass
+
+    def fechar(self):
+        pass
+
+    def verificar_csv(self):
+        pass
+
+    @abstractmethod
+    def consolidar(self):
+        pass
+
+    @abstractmethod
+    def obter(self, id_voo):
+        pass
+
+    @abstractmethod
+    def listar(self):
+        pass
+
+    # Devolve (linhas, cursor da próxima página ou None); veja
+    # RepositorioVoos.consultar.
+    @abstractmethod
+    def consultar(self, filtros=None, partida_de=None, partida_ate=None,
+                  offset=0, limit=None, cursor=None):
+        pass
+
+    @abstractmethod
+    def contar(self):
+        pass
+
+    @abstractmethod
+    def inserir(self, registro):
+        pass
+
+    @abstractmethod
+    def atualizar(self, id_voo, registro):
+        pass
+
+    @abstractmethod
+    def deletar(self, id_voo):
+        pass
+
+    # Aplica várias operações ("inserir", "atualizar", "deletar") numa única
+    # gravação. Devolve, na mesma ordem, o retorno de cada operação ou a
+    # exceção que ela levantou.
+    @abstractmethod
+    def aplicar_lote(self, operacoes):
+        pass
+
+    # Grava todos os voos em destino, de uma vez (veja gravar_csv).
+    def exportar_csv(self, destino):
+        gravar_csv(destino, self.header, self.listar())
+
+
+def criar_repositorio(armazenamento=ARMAZENAMENTO):
+    if armazenamento == "csv":
+        from repositorio import RepositorioVoos
+        return RepositorioVoos()
+    if armazenamento == "sqlite":
+        from repositorio_sqlite import RepositorioSQLite
+        return RepositorioSQLite(SQLITE_FILE)
+    raise ValueError(f"Armazenamento desconhecido: {armazenamento}")
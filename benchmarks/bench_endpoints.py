@@ -0,0 +1,249 @@
+"""Latência (p50/p95/p99) e vazão de cada endpoint de main.py, em processo.
+
+Para cada tamanho gera um voos.csv sintético num diretório temporário e sobe
+o app num subprocesso novo, sem servidor: as requisições vão pelo
+httpx.ASGITransport. Depois dos endpoints isolados roda uma carga mista de
+leituras e escritas concorrentes e mostra as taxas de acerto dos caches
+vindas de /metrics.
+
+Uso: python benchmarks/bench_endpoints.py [--linhas 10000 100000 1000000]
+         [--requisicoes 200] [--concorrencia 16] [--armazenamento csv|sqlite]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(DIRETORIO, ".."))
+
+from gerar_voos import gerar_arquivo, gerar_voo  # noqa: E402
+
+# Endpoints que devolvem ou leem o arquivo inteiro rodam menos vezes.
+FRACAO_PESADOS = 20
+# Linhas por requisição em POST /voos/bulk.
+LINHAS_BULK = 1000
+# Proporção de cada operação na carga mista.
+CARGA_MISTA = [
+    ("GET /voos/{id}", 40),
+    ("GET /voos/?cia&limit", 15),
+    ("GET /voos/?partida", 5),
+    ("GET /voos/ (tudo)", 1),
+    ("GET /contar_registros", 8),
+    ("GET /hash/", 3),
+    ("GET /voos/compactar", 3),
+    ("PUT /voos/{id}", 10),
+    ("POST /voos/", 8),
+    ("DELETE /voos/{id}", 6),
+    ("POST /voos/bulk", 1),
+]
+
+
+def percentil(ordenados, fracao):
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+def corpo_voo(campos):
+    return dict(zip(["id_voo", "numero_voo", "cia", "origem", "destino", "horario_partida",
+                     "horario_chegada", "id_aeronave", "status"], campos))
+
+
+# Executa requisicao(i) para i em range(total) com até `concorrencia`
+# requisições em voo; devolve as latências e o tempo total.
+async def medir(requisicao, total, concorrencia=1):
+    latencias = []
+    proximo = iter(range(total))
+
+    async def trabalhador():
+        for indice in proximo:
+            inicio = time.perf_counter()
+            resposta = await requisicao(indice)
+            latencias.append(time.perf_counter() - inicio)
+            if resposta.status_code >= 500:
+                raise RuntimeError(f"{resposta.status_code}: {resposta.text[:200]}")
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return latencias, time.perf_counter() - inicio
+
+
+def resultado(nome, latencias, duracao):
+    ordenados = sorted(latencias)
+    return {
+        "nome": nome,
+        "requisicoes": len(ordenados),
+        "p50": percentil(ordenados, 0.50) * 1000,
+        "p95": percentil(ordenados, 0.95) * 1000,
+        "p99": percentil(ordenados, 0.99) * 1000,
+        "vazao": len(ordenados) / duracao,
+    }
+
+
+async def rodar(linhas, requisicoes, concorrencia):
+    import httpx
+    import main
+
+    aleatorio = random.Random(7)
+    pesados = max(3, requisicoes // FRACAO_PESADOS)
+    novo_id = linhas + 1
+    resultados = []
+
+    async with main.lifespan(main.app):
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench",
+                                     timeout=None) as cliente:
+
+            def ler(url, **params):
+                return lambda _: cliente.get(url, params=params)
+
+            ler_partida = ler("/voos/", partida_de="2024-11-10T00:00:00+00:00",
+                              partida_ate="2024-11-10T06:00:00+00:00")
+
+            def ler_id(_):
+                return cliente.get(f"/voos/{aleatorio.randint(1, linhas)}")
+
+            # Ids criados pelo benchmark, apagados pelo DELETE da carga mista.
+            criados = []
+
+            def inserir(_):
+                nonlocal novo_id
+                novo_id += 1
+                criados.append(novo_id)
+                return cliente.post("/voos/", json=corpo_voo(gerar_voo(aleatorio, novo_id)))
+
+            def atualizar(_):
+                id_voo = aleatorio.randint(1, linhas)
+                return cliente.put(f"/voos/{id_voo}", json=corpo_voo(gerar_voo(aleatorio, id_voo)))
+
+            def deletar(_):
+                id_voo = criados.pop() if criados else aleatorio.randint(1, linhas)
+                return cliente.delete(f"/voos/{id_voo}")
+
+            def bulk(_):
+                nonlocal novo_id
+                texto = "".join(
+                    json.dumps(corpo_voo(gerar_voo(aleatorio, novo_id + 1 + i)), ensure_ascii=False) + "\n"
+                    for i in range(LINHAS_BULK))
+                criados.extend(range(novo_id + 1, novo_id + 1 + LINHAS_BULK))
+                novo_id += LINHAS_BULK
+                return cliente.post("/voos/bulk", content=texto.encode(),
+                                    headers={"content-type": "application/x-ndjson"})
+
+            isolados = [
+                ("GET /", ler("/"), requisicoes),
+                ("GET /voos/{id}", ler_id, requisicoes),
+                ("GET /voos/?limit=100", ler("/voos/", limit=100, offset=linhas // 2), requisicoes),
+                ("GET /voos/?cia&limit", ler("/voos/", cia="Gol", limit=100), requisicoes),
+                ("GET /voos/?partida", ler_partida, requisicoes),
+                ("GET /voos/ (tudo)", ler("/voos/"), pesados),
+                ("GET /voos/?formato=ndjson", ler("/voos/", formato="ndjson"), pesados),
+                ("GET /contar_registros", ler("/contar_registros"), requisicoes),
+                ("POST /voos/", inserir, requisicoes),
+                ("PUT /voos/{id}", atualizar, requisicoes),
+                ("DELETE /voos/{id}", deletar, requisicoes),
+                ("POST /voos/bulk", bulk, pesados),
+                ("GET /hash/", ler("/hash/"), requisicoes),
+                ("GET /voos/compactar", ler("/voos/compactar"), requisicoes),
+                ("GET /metrics", ler("/metrics"), requisicoes),
+            ]
+            for nome, requisicao, total in isolados:
+                resultados.append(resultado(nome, *await medir(requisicao, total)))
+
+            # Carga mista: cada requisição sorteia a operação pelos pesos.
+            operacoes = {
+                "GET /voos/{id}": ler_id,
+                "GET /voos/?cia&limit": ler("/voos/", cia="Latam", limit=100),
+                "GET /voos/?partida": ler_partida,
+                "GET /voos/ (tudo)": ler("/voos/"),
+                "GET /contar_registros": ler("/contar_registros"),
+                "GET /hash/": ler("/hash/"),
+                "GET /voos/compactar": ler("/voos/compactar"),
+                "PUT /voos/{id}": atualizar,
+                "POST /voos/": inserir,
+                "DELETE /voos/{id}": deletar,
+                "POST /voos/bulk": bulk,
+            }
+            nomes = [nome for nome, _ in CARGA_MISTA]
+            pesos = [peso for _, peso in CARGA_MISTA]
+            sorteio = aleatorio.choices(nomes, pesos, k=requisicoes * 5)
+            por_operacao = {nome: [] for nome in nomes}
+
+            async def misturada(indice):
+                nome = sorteio[indice]
+                inicio = time.perf_counter()
+                resposta = await operacoes[nome](indice)
+                por_operacao[nome].append(time.perf_counter() - inicio)
+                return resposta
+
+            latencias, duracao = await medir(misturada, len(sorteio), concorrencia)
+            resultados.append(resultado(f"mista (concorrência {concorrencia})", latencias, duracao))
+            for nome in nomes:
+                if por_operacao[nome]:
+                    resultados.append(resultado(f"  mista: {nome}", por_operacao[nome], duracao))
+
+            metricas = (await cliente.get("/metrics")).text
+    caches = [linha for linha in metricas.splitlines()
+              if linha.startswith(("voos_cache_taxa_acerto{", "voos_csv_bytes"))]
+    return resultados, caches
+
+
+# Roda no subprocesso, já dentro do diretório temporário.
+def filho(args):
+    linhas = args.linhas[0]
+    inicio = time.perf_counter()
+    gerar_arquivo("voos.csv", linhas)
+    if args.armazenamento == "sqlite":
+        from repositorio import RepositorioVoos
+        from repositorio_sqlite import RepositorioSQLite
+        fonte = RepositorioVoos("voos.csv")
+        fonte.carregar()
+        banco = RepositorioSQLite(os.environ["VOOS_SQLITE"])
+        banco.importar(fonte.listar())
+        banco.fechar()
+    preparo = time.perf_counter() - inicio
+    resultados, caches = asyncio.run(rodar(linhas, args.requisicoes, args.concorrencia))
+    print(json.dumps({"preparo": preparo, "resultados": resultados, "caches": caches}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--requisicoes", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--armazenamento", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--filho", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        filho(args)
+        return
+
+    for linhas in args.linhas:
+        with tempfile.TemporaryDirectory() as diretorio:
+            # Um processo por tamanho: o app e os caches começam do zero.
+            env = dict(os.environ, VOOS_ARMAZENAMENTO=args.armazenamento,
+                       VOOS_SQLITE=os.path.join(diretorio, "voos.db"))
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--filho", "--linhas", str(linhas),
+                 "--requisicoes", str(args.requisicoes), "--concorrencia", str(args.concorrencia),
+                 "--armazenamento", args.armazenamento],
+                cwd=diretorio, env=env, check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout
+        dados = json.loads(saida.splitlines()[-1])
+
+        print(f"\n{linhas} voos ({args.armazenamento}, preparo em {dados['preparo']:.1f} s)")
+        print(f"{'endpoint':<36} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+        for item in dados["resultados"]:
+            print(f"{item['nome']:<36} {item['requisicoes']:>6} {item['p50']:>9.2f} "
+                  f"{item['p95']:>9.2f} {item['p99']:>9.2f} {item['vazao']:>9.1f}")
+        for linha in dados["caches"]:
+            print(linha)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compara o GET /hash/ antigo (file.read() + sha256) com o HashArquivo.
+
+Uso: python benchmarks/bench_hash.py [--tamanho-mb 1024] [--repeticoes 3]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from hash_csv import HashArquivo  # noqa: E402
+
+LINHA = ("{0},{0},Gol,São Paulo,Rio de Janeiro,2024-11-22 08:00:00+00:00,"
+         "2024-11-22 09:30:00+00:00,10,No Horário\r\n")
+
+
+def gerar_arquivo(caminho, tamanho_mb):
+    limite = tamanho_mb * 1024 * 1024
+    with open(caminho, "w", newline="") as file:
+        file.write("id_voo,numero_voo,cia,origem,destino,horario_partida,"
+                   "horario_chegada,id_aeronave,status\r\n")
+        id_voo = 0
+        while file.tell() < limite:
+            file.write("".join(LINHA.format(id_voo + i) for i in range(10000)))
+            id_voo += 10000
+    return id_voo
+
+
+def medir(funcao, repeticoes):
+    tempos = []
+    pico = 0
+    for _ in range(repeticoes):
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+        pico = max(pico, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return min(tempos), pico
+
+
+def hash_antigo(caminho):
+    with open(caminho, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanho-mb", type=int, default=1024)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "voos.csv")
+        proximo_id = gerar_arquivo(caminho, args.tamanho_mb)
+        print(f"arquivo: {os.path.getsize(caminho) / 1024 / 1024:.0f} MB")
+
+        def frio():
+            HashArquivo(caminho).calcular()
+
+        hash_arquivo = HashArquivo(caminho)
+        hash_arquivo.calcular()
+
+        linha = LINHA.format(proximo_id).encode()
+
+        def anexacao():
+            with open(caminho, "ab") as file:
+                antes = os.fstat(file.fileno())
+                file.write(linha)
+                file.flush()
+                depois = os.fstat(file.fileno())
+            hash_arquivo.anexado(antes, linha, depois)
+            hash_arquivo.calcular()
+
+        resultados = [
+            ("antes: file.read() + sha256", medir(lambda: hash_antigo(caminho), args.repeticoes)),
+            ("depois: mmap em blocos (sem cache)", medir(frio, args.repeticoes)),
+            ("depois: em cache", medir(hash_arquivo.calcular, args.repeticoes)),
+            ("depois: após anexar uma linha", medir(anexacao, args.repeticoes)),
+        ]
+        assert hash_arquivo.calcular() == hash_antigo(caminho)
+
+        for nome, (tempo, pico) in resultados:
+            print(f"{nome:<40} {tempo * 1000:10.2f} ms  pico {pico / 1024 / 1024:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
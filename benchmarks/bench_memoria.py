@@ -0,0 +1,78 @@
+"""Memória para manter os voos carregados: dicts do DictReader x RegistroVoo.
+
+Uso: python benchmarks/bench_memoria.py [--linhas 1000000]
+"""
+import argparse
+import csv
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gerar_voos import gerar_arquivo  # noqa: E402
+from registro import RegistroVoo  # noqa: E402
+from repositorio import RepositorioVoos  # noqa: E402
+
+
+def carregar_dicts(caminho):
+    with open(caminho, "r", newline="") as file:
+        return {int(row["id_voo"]): row for row in csv.DictReader(file)}
+
+
+def carregar_registros(caminho):
+    with open(caminho, "r", newline="") as file:
+        reader = csv.reader(file)
+        next(reader)
+        voos = {}
+        for campos in reader:
+            registro = RegistroVoo.de_campos(*campos)
+            voos[registro.id_voo] = registro
+        return voos
+
+
+def carregar_repositorio(caminho):
+    repositorio = RepositorioVoos(caminho)
+    repositorio.carregar()
+    return repositorio
+
+
+def medir(funcao, caminho):
+    gc.collect()
+    inicio = time.perf_counter()
+    tracemalloc.start()
+    resultado = funcao(caminho)
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tempo = time.perf_counter() - inicio
+    del resultado
+    gc.collect()
+    return memoria, tempo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "voos.csv")
+        gerar_arquivo(caminho, args.linhas)
+        print(f"{args.linhas} linhas, {os.path.getsize(caminho) / 1024 / 1024:.0f} MB em disco")
+
+        por_milhao = 1000000 / args.linhas
+        for nome, funcao in [
+            ("antes: dict do DictReader por linha", carregar_dicts),
+            ("depois: RegistroVoo por linha", carregar_registros),
+            ("depois: RepositorioVoos com índices", carregar_repositorio),
+        ]:
+            memoria, tempo = medir(funcao, caminho)
+            print(f"{nome:<40} {memoria * por_milhao / 1024 / 1024:8.0f} MB/1M linhas"
+                  f"  {memoria / args.linhas:6.0f} B/linha  (carga em {tempo:.1f} s com tracemalloc)")
+
+
+if __name__ == "__main__":
+    main()
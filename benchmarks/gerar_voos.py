@@ -0,0 +1,57 @@
+"""Gera um voos.csv sintético e reproduzível para os benchmarks.
+
+Uso: python benchmarks/gerar_voos.py voos.csv [--linhas 100000] [--semente 42]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from armazenamento import HEADER  # noqa: E402
+
+CIAS = ["Azul", "Gol", "Latam", "Voepass"]
+AEROPORTOS = ["São Paulo", "Rio de Janeiro", "Brasília", "Salvador", "Recife",
+              "Fortaleza", "Porto Alegre", "Curitiba", "Manaus", "Belém",
+              "Belo Horizonte", "Florianópolis", "Goiânia", "Natal", "Maceió"]
+STATUS = ["No Horário", "Atrasado", "Cancelado", "Em voo", "Pousado"]
+INICIO = datetime(2024, 11, 1, tzinfo=timezone.utc)
+
+
+# Campos de um voo aleatório, na ordem de HEADER.
+def gerar_voo(aleatorio, id_voo):
+    partida = INICIO + timedelta(minutes=30 * aleatorio.randrange(2000))
+    chegada = partida + timedelta(minutes=30 * aleatorio.randrange(1, 10))
+    return [id_voo, 100 + id_voo % 9000, aleatorio.choice(CIAS),
+            aleatorio.choice(AEROPORTOS), aleatorio.choice(AEROPORTOS),
+            partida.isoformat(), chegada.isoformat(),
+            aleatorio.randrange(1, 500), aleatorio.choice(STATUS)]
+
+
+# Os ids vão de 1 a linhas; a mesma semente gera sempre o mesmo arquivo.
+def gerar_arquivo(caminho, linhas, semente=42):
+    aleatorio = random.Random(semente)
+    with open(caminho, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        for id_voo in range(1, linhas + 1):
+            writer.writerow(gerar_voo(aleatorio, id_voo))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("caminho")
+    parser.add_argument("--linhas", type=int, default=100000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    gerar_arquivo(args.caminho, args.linhas, args.semente)
+    print(f"{args.linhas} voos em {args.caminho} "
+          f"({os.path.getsize(args.caminho) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
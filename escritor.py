@@ -0,0 +1,93 @@
+import asyncio
+
+# Número máximo de operações gravadas num mesmo lote.
+TAMANHO_LOTE = 512
+
+
+# Única tarefa que escreve no repositório. Os handlers colocam as operações
+# numa fila e esperam o resultado; a tarefa junta tudo o que estiver na fila
+# num lote, grava com um único fsync (group commit) e só então responde
+# a cada um dos pedidos.
+class EscritorVoos:
+    def __init__(self, repositorio, tamanho_lote=TAMANHO_LOTE):
+        self.repositorio = repositorio
+        self.tamanho_lote = tamanho_lote
+        self._fila = None
+        self._tarefa = None
+
+    def iniciar(self):
+        self._fila = asyncio.Queue()
+        self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        # O None marca o fim; o que já está na fila é gravado antes.
+        await self._fila.put(None)
+        await self._tarefa
+        self._tarefa = None
+
+    async def enviar(self, operacao, *args):
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put(([(operacao, args)], futuro, True))
+        return await futuro
+
+    # Envia várias operações como um único item da fila, para que entrem
+    # juntas no mesmo lote. Devolve a lista de resultados, com as exceções
+    # no lugar das operações que falharam, em vez de levantá-las.
+    async def enviar_varios(self, operacoes):
+        if not operacoes:
+            return []
+        futuro = asyncio.get_running_loop().create_future()
+        await self._fila.put((list(operacoes), futuro, False))
+        return await futuro
+
+    async def inserir(self, registro):
+        return await self.enviar("inserir", registro)
+
+    async def inserir_varios(self, registros):
+        return await self.enviar_varios([("inserir", (registro,)) for registro in registros])
+
+    async def atualizar(self, id_voo, registro):
+        return await self.enviar("atualizar", id_voo, registro)
+
+    async def deletar(self, id_voo):
+        return await self.enviar("deletar", id_voo)
+
+    async def _executar(self):
+        parar = False
+        while not parar:
+            lote = [await self._fila.get()]
+            quantidade = len(lote[0][0]) if lote[0] is not None else 0
+            while quantidade < self.tamanho_lote and not self._fila.empty():
+                item = self._fila.get_nowait()
+                lote.append(item)
+                if item is not None:
+                    quantidade += len(item[0])
+            if None in lote:
+                parar = True
+                lote = [item for item in lote if item is not None]
+            if not lote:
+                continue
+
+            operacoes = [operacao for itens, _, _ in lote for operacao in itens]
+            try:
+                # O fsync bloqueia, então roda fora do event loop.
+                resultados = await asyncio.to_thread(
+                    self.repositorio.aplicar_lote, operacoes)
+            except Exception as e:
+                for _, futuro, _ in lote:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+
+            inicio = 0
+            for itens, futuro, unico in lote:
+                parte = resultados[inicio:inicio + len(itens)]
+                inicio += len(itens)
+                if futuro.done():
+                    continue
+                if not unico:
+                    futuro.set_result(parte)
+                elif isinstance(parte[0], Exception):
+                    futuro.set_exception(parte[0])
+                else:
+                    futuro.set_result(parte[0])
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import zipfile
+
+from hash_csv import chave_arquivo
+from metricas import metricas
+
+DIRETORIO_CACHE = "exportacoes"
+
+ALGORITMOS = {
+    "deflate": zipfile.ZIP_DEFLATED,
+    "bzip2": zipfile.ZIP_BZIP2,
+    "lzma": zipfile.ZIP_LZMA,
+}
+
+# Bytes do CSV lidos e comprimidos por vez.
+TAMANHO_BLOCO = 1024 * 1024
+
+
+class NivelInvalido(Exception):
+    pass
+
+
+# Destino do zipfile que só acumula o que foi escrito; quem gera o ZIP
+# retira os bytes depois de cada bloco para enviá-los na resposta.
+class _Saida:
+    def __init__(self):
+        self.pedacos = []
+
+    def write(self, dados):
+        self.pedacos.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        dados = b"".join(self.pedacos)
+        self.pedacos = []
+        return dados
+
+
+# Gera o ZIP do CSV e guarda uma cópia em diretorio, com nome derivado do
+# SHA256 do CSV, do algoritmo e do nível. Enquanto o CSV não muda, o mesmo
+# arquivo é devolvido; numa falta, o ZIP é comprimido em blocos direto para
+# a resposta e gravado ao mesmo tempo num temporário exclusivo, que só vira
+# cache quando termina.
+class ExportadorZip:
+    def __init__(self, caminho, hash_arquivo, diretorio=DIRETORIO_CACHE, nome=None):
+        self.caminho = caminho
+        # Nome do CSV dentro do ZIP.
+        self.nome = nome or os.path.basename(caminho)
+        self.hash_arquivo = hash_arquivo
+        self.diretorio = diretorio
+
+    def _caminho_cache(self, digest, algoritmo, nivel):
+        return os.path.join(self.diretorio, f"{digest}-{algoritmo}-{nivel}.zip")
+
+    # Só apaga os ZIPs de outras versões se digest ainda for o SHA256 do CSV
+    # atual: um ZIP de uma versão antiga que terminou atrasado não pode
+    # apagar o da versão nova, que outra requisição pode estar enviando.
+    def _remover_antigos(self, digest):
+        if self.hash_arquivo.guardado() != digest:
+            return
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith(".zip") and not nome.startswith(digest):
+                try:
+                    os.remove(os.path.join(self.diretorio, nome))
+                except FileNotFoundError:
+                    pass
+
+    # Devolve (gerador de bytes do ZIP, tamanho do ZIP ou None se ainda não
+    # se sabe). Um ZIP em cache já é aberto aqui, então continua podendo ser
+    # enviado mesmo que outra requisição o apague em seguida.
+    def exportar(self, algoritmo="deflate", nivel=None):
+        compressao = ALGORITMOS[algoritmo]
+        if nivel is not None and algoritmo == "bzip2" and not 1 <= nivel <= 9:
+            raise NivelInvalido("bzip2 aceita níveis de 1 a 9.")
+        if algoritmo == "lzma":
+            # O zipfile ignora o nível no lzma; todos dão o mesmo ZIP.
+            nivel = None
+        os.makedirs(self.diretorio, exist_ok=True)
+
+        file = open(self.caminho, "rb")
+        try:
+            digest, chave = self.hash_arquivo.calcular_com_chave()
+            # O digest só vale para o arquivo aberto se ele ainda estiver
+            # como quando o hash foi calculado; nesse caso são lidos só os
+            # bytes que entraram no hash, mesmo que algo seja anexado depois.
+            # Senão o ZIP é gerado, mas sem guardar no cache.
+            confiavel = chave_arquivo(os.fstat(file.fileno())) == chave
+            destino = self._caminho_cache(digest, algoritmo, nivel)
+            if confiavel:
+                try:
+                    zip_cache = open(destino, "rb")
+                except FileNotFoundError:
+                    pass
+                else:
+                    metricas.acesso_cache("zip", True)
+                    file.close()
+                    return self._enviar(zip_cache), os.fstat(zip_cache.fileno()).st_size
+            metricas.acesso_cache("zip", False)
+            limite = chave[1] if confiavel else None
+        except BaseException:
+            file.close()
+            raise
+        return self._gerar(file, compressao, nivel, destino if confiavel else None, digest, limite), None
+
+    def _enviar(self, file):
+        with file:
+            while True:
+                bloco = file.read(TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                yield bloco
+
+    def _gerar(self, file, compressao, nivel, destino, digest, limite):
+        temporario = None
+        copia = None
+        try:
+            if destino is not None:
+                fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+                copia = os.fdopen(fd, "wb")
+            tamanho = os.fstat(file.fileno()).st_size if limite is None else limite
+            restante = tamanho
+            saida = _Saida()
+            with zipfile.ZipFile(saida, "w", compressao, compresslevel=nivel) as zipf:
+                with zipf.open(self.nome, "w", force_zip64=tamanho > zipfile.ZIP64_LIMIT) as entrada:
+                    while True:
+                        bloco = file.read(TAMANHO_BLOCO if limite is None
+                                          else min(TAMANHO_BLOCO, restante))
+                        if not bloco:
+                            break
+                        restante -= len(bloco)
+                        metricas.bytes_lidos(len(bloco))
+                        entrada.write(bloco)
+                        dados = saida.retirar()
+                        if dados:
+                            if copia is not None:
+                                copia.write(dados)
+                            yield dados
+            dados = saida.retirar()
+            if copia is not None:
+                copia.write(dados)
+                copia.close()
+                copia = None
+                os.replace(temporario, destino)
+                temporario = None
+                self._remover_antigos(digest)
+            yield dados
+        finally:
+            file.close()
+            if copia is not None:
+                copia.close()
+            if temporario is not None and os.path.exists(temporario):
+                os.remove(temporario)
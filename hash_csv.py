@@ -0,0 +1,76 @@
+import hashlib
+import mmap
+import os
+import threading
+
+from metricas import metricas
+
+# Tamanho dos pedaços passados ao sha256 ao ler o arquivo inteiro.
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def chave_arquivo(stat):
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+# SHA256 de um arquivo, guardado enquanto (mtime, tamanho, inode) não mudar.
+# O arquivo é lido em blocos via mmap, com memória constante. Anexações
+# avisadas por anexado() só acrescentam os bytes novos ao estado do hash,
+# sem reler o arquivo.
+class HashArquivo:
+    def __init__(self, caminho, tamanho_bloco=TAMANHO_BLOCO):
+        self.caminho = caminho
+        self.tamanho_bloco = tamanho_bloco
+        self._estado = None
+        self._chave = None
+        self._lock = threading.Lock()
+
+    def _calcular_completo(self):
+        estado = hashlib.sha256()
+        with open(self.caminho, "rb") as file:
+            stat = os.fstat(file.fileno())
+            metricas.bytes_lidos(stat.st_size)
+            if stat.st_size:
+                with mmap.mmap(file.fileno(), stat.st_size, access=mmap.ACCESS_READ) as mapa:
+                    with memoryview(mapa) as visao:
+                        for inicio in range(0, stat.st_size, self.tamanho_bloco):
+                            estado.update(visao[inicio:inicio + self.tamanho_bloco])
+        return estado, chave_arquivo(stat)
+
+    def calcular(self):
+        return self.calcular_com_chave()[0]
+
+    # Devolve (SHA256, chave_arquivo do conteúdo que gerou esse SHA256).
+    def calcular_com_chave(self):
+        with self._lock:
+            if self._chave == chave_arquivo(os.stat(self.caminho)):
+                metricas.acesso_cache("hash", True)
+                return self._estado.hexdigest(), self._chave
+        metricas.acesso_cache("hash", False)
+        estado, chave = self._calcular_completo()
+        with self._lock:
+            self._estado = estado
+            self._chave = chave
+            return estado.hexdigest(), chave
+
+    # SHA256 guardado, se ainda for o do arquivo atual; não lê o arquivo.
+    def guardado(self):
+        with self._lock:
+            try:
+                chave = chave_arquivo(os.stat(self.caminho))
+            except FileNotFoundError:
+                return None
+            return self._estado.hexdigest() if self._chave == chave else None
+
+    # Chamado por quem anexou dados ao arquivo: antes e depois são os stat
+    # do arquivo em volta da escrita. Se o hash guardado era o do arquivo
+    # antes, basta continuar o sha256 com os bytes anexados.
+    def anexado(self, antes, dados, depois):
+        with self._lock:
+            if self._chave is None or self._chave != chave_arquivo(antes):
+                return
+            if depois.st_ino != antes.st_ino or depois.st_size != antes.st_size + len(dados):
+                self._chave = None
+                return
+            self._estado.update(dados)
+            self._chave = chave_arquivo(depois)
@@ -0,0 +1,85 @@
+import codecs
+import csv
+import json
+
+# Quantidade de linhas validadas e enviadas ao escritor de cada vez.
+TAMANHO_BLOCO = 5000
+
+
+class LinhaInvalida(Exception):
+    pass
+
+
+# Junta os pedaços recebidos em linhas completas, sem guardar o corpo
+# inteiro na memória. Com aspas=True uma linha só termina quando as aspas
+# estão fechadas, para campos CSV que contêm quebras de linha.
+async def ler_linhas(pedacos, aspas=False):
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    resto = ""
+    async for pedaco in pedacos:
+        resto += decodificador.decode(pedaco)
+        comeco = 0
+        busca = 0
+        while True:
+            fim = resto.find("\n", busca)
+            if fim == -1:
+                break
+            busca = fim + 1
+            if aspas and resto.count('"', comeco, fim) % 2:
+                continue
+            yield resto[comeco:fim + 1]
+            comeco = fim + 1
+        resto = resto[comeco:]
+    resto += decodificador.decode(b"", final=True)
+    if resto.strip():
+        yield resto
+
+
+# Devolve (número da linha, dicionário) para cada registro do CSV; a
+# primeira linha é o cabeçalho. Linhas que não dá para ler viram LinhaInvalida.
+async def ler_csv(pedacos):
+    cabecalho = None
+    numero = 0
+    async for linha in ler_linhas(pedacos, aspas=True):
+        numero += 1
+        if not linha.strip():
+            continue
+        campos = next(csv.reader([linha]))
+        if cabecalho is None:
+            cabecalho = campos
+            continue
+        if len(campos) != len(cabecalho):
+            yield numero, LinhaInvalida(
+                f"esperados {len(cabecalho)} campos, encontrados {len(campos)}")
+            continue
+        yield numero, dict(zip(cabecalho, campos))
+
+
+# Devolve (número da linha, objeto) para cada linha de um NDJSON.
+async def ler_ndjson(pedacos):
+    numero = 0
+    async for linha in ler_linhas(pedacos):
+        numero += 1
+        if not linha.strip():
+            continue
+        try:
+            objeto = json.loads(linha)
+        except ValueError as e:
+            yield numero, LinhaInvalida(f"JSON inválido: {e}")
+            continue
+        if not isinstance(objeto, dict):
+            yield numero, LinhaInvalida("esperado um objeto JSON")
+            continue
+        yield numero, objeto
+
+
+# Agrupa os registros em blocos de até tamanho itens.
+async def em_blocos(registros, tamanho=TAMANHO_BLOCO):
+    bloco = []
+    async for registro in registros:
+        bloco.append(registro)
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
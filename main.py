@@ -1,19 +1,34 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import csv
-import os
-import hashlib
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from pydantic import BaseModel, ValidationError
 from datetime import datetime
-import zipfile
-from fastapi.responses import FileResponse
-
-app = FastAPI()
-
-CSV_FILE = "voos.csv"
-
-HEADER = ["id_voo", "numero_voo", "cia", "origem", 
-          "destino", "horario_partida", "horario_chegada", 
-          "id_aeronave", "status"]
+from typing import Literal, Optional
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from armazenamento import VooDuplicado, criar_repositorio
+from escritor import EscritorVoos
+from hash_csv import HashArquivo
+from exportacao import ExportadorZip, NivelInvalido
+from importacao import LinhaInvalida, em_blocos, ler_csv, ler_ndjson
+from registro import RegistroVoo, serializar_json, serializar_ndjson
+from metricas import MiddlewareMetricas, metricas
+
+# Armazenamento escolhido por VOOS_ARMAZENAMENTO ("csv" ou "sqlite").
+repositorio = criar_repositorio()
+escritor = EscritorVoos(repositorio)
+hash_csv = HashArquivo(repositorio.caminho_csv)
+repositorio.observadores_anexacao.append(hash_csv.anexado)
+exportador = ExportadorZip(repositorio.caminho_csv, hash_csv, nome="voos.csv")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    repositorio.carregar()
+    escritor.iniciar()
+    yield
+    await escritor.parar()
+    repositorio.fechar()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MiddlewareMetricas, metricas=metricas)
 
 class Voo(BaseModel):
     id_voo: int
@@ -26,177 +41,209 @@ class Voo(BaseModel):
     id_aeronave: int
     status: str
 
+def voo_para_registro(voo: Voo):
+    return RegistroVoo.de_campos(
+        voo.id_voo, voo.numero_voo, voo.cia, voo.origem, voo.destino,
+        voo.horario_partida, voo.horario_chegada, voo.id_aeronave, voo.status
+    )
+
 @app.get("/")
 def read_root():
     return {"message": "Serviço de Gerenciamento de Voos"}
 
 def verificar_csv():
-    if not os.path.exists(CSV_FILE):
-        with open(CSV_FILE, "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(HEADER)
+    repositorio.verificar_csv()
 
 # Funcionalidade 1: Inserir dados no CSV
 @app.post("/voos/")
-def inserir_voo(voo: Voo):
-    verificar_csv()
-
+async def inserir_voo(voo: Voo):
     try:
-        with open(CSV_FILE, "a", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow([
-                voo.id_voo, voo.numero_voo, voo.cia, voo.origem,
-                voo.destino, voo.horario_partida.isoformat(),
-                voo.horario_chegada.isoformat(), voo.id_aeronave, voo.status
-            ])
+        await escritor.inserir(voo_para_registro(voo))
         return {"message": "Voo inserido com sucesso!"}
+    except VooDuplicado:
+        raise HTTPException(status_code=409, detail="Já existe um voo com esse ID.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao salvar dados: {e}")
 
-# Funcionalidade 2: Retornar todos os dados cadastrados no CSV
+# Funcionalidade 1: Inserir vários voos de uma vez (CSV ou NDJSON)
+# O corpo é lido em pedaços e validado em blocos; cada linha rejeitada
+# aparece em "erros" com o número da linha e o motivo.
+@app.post("/voos/bulk")
+async def inserir_voos_em_lote(request: Request):
+    tipo = request.headers.get("content-type", "")
+    if "csv" in tipo:
+        registros = ler_csv(request.stream())
+    elif "json" in tipo:
+        registros = ler_ndjson(request.stream())
+    else:
+        raise HTTPException(status_code=415, detail="Envie text/csv ou application/x-ndjson.")
+
+    inseridos = 0
+    erros = []
+    try:
+        async for bloco in em_blocos(registros):
+            numeros = []
+            validos = []
+            for numero, registro in bloco:
+                if isinstance(registro, LinhaInvalida):
+                    erros.append({"linha": numero, "erro": str(registro)})
+                    continue
+                try:
+                    voo = Voo.model_validate(registro)
+                except ValidationError as e:
+                    erros.append({"linha": numero, "erro": "; ".join(
+                        f"{'.'.join(map(str, erro['loc']))}: {erro['msg']}" for erro in e.errors())})
+                    continue
+                numeros.append(numero)
+                validos.append(voo_para_registro(voo))
+
+            resultados = await escritor.inserir_varios(validos)
+            for numero, resultado in zip(numeros, resultados):
+                if isinstance(resultado, VooDuplicado):
+                    erros.append({"linha": numero, "erro": "Já existe um voo com esse ID."})
+                elif isinstance(resultado, Exception):
+                    erros.append({"linha": numero, "erro": f"Erro ao salvar dados: {resultado}"})
+                else:
+                    inseridos += 1
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao importar voos: {e}")
+
+    erros.sort(key=lambda erro: erro["linha"])
+    return {"message": "Importação concluída.", "inseridos": inseridos, "erros": erros}
+
+# Linhas enviadas por vez nas respostas em streaming.
+LINHAS_POR_PEDACO = 1000
+
+def gerar_json(registros):
+    yield b"["
+    for inicio in range(0, len(registros), LINHAS_POR_PEDACO):
+        # Tira os colchetes do pedaço para emendar no mesmo array.
+        pedaco = serializar_json(registros[inicio:inicio + LINHAS_POR_PEDACO])[1:-1]
+        yield (b"," if inicio else b"") + pedaco
+    yield b"]"
+
+def gerar_ndjson(registros):
+    for inicio in range(0, len(registros), LINHAS_POR_PEDACO):
+        yield serializar_ndjson(registros[inicio:inicio + LINHAS_POR_PEDACO])
+
+# Funcionalidade 2: Retornar os dados cadastrados no CSV
+# Sem parâmetros devolve tudo, como antes. limit/offset paginam e o cabeçalho
+# X-Proximo-Cursor traz o valor de "cursor" para pedir a página seguinte.
+# formato=ndjson ou stream=true enviam a resposta em pedaços.
 @app.get("/voos/")
-def listar_voos():
-    verificar_csv()
+def listar_voos(
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[int] = None,
+    cia: Optional[str] = None,
+    origem: Optional[str] = None,
+    destino: Optional[str] = None,
+    status: Optional[str] = None,
+    partida_de: Optional[datetime] = None,
+    partida_ate: Optional[datetime] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    stream: bool = False,
+):
+    filtros = {campo: valor for campo, valor in
+               (("cia", cia), ("origem", origem), ("destino", destino), ("status", status))
+               if valor is not None}
     try:
-        with open(CSV_FILE, "r") as file:
-            reader = csv.DictReader(file)
-            voos = [
-                {key: int(value) if key in ["id_voo", "numero_voo", "id_aeronave"] else value
-                 for key, value in row.items()}
-                for row in reader
-            ]
-        return voos
+        registros, proximo = repositorio.consultar(
+            filtros, partida_de, partida_ate, offset, limit, cursor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao listar voos: {e}")
 
+    headers = {"X-Proximo-Cursor": str(proximo)} if proximo is not None else None
+    if formato == "ndjson":
+        return StreamingResponse(gerar_ndjson(registros), media_type="application/x-ndjson",
+                                 headers=headers)
+    if stream:
+        return StreamingResponse(gerar_json(registros), media_type="application/json",
+                                 headers=headers)
+    return Response(serializar_json(registros), media_type="application/json", headers=headers)
+
+# Funcionalidade 5: Compactar o arquivo CSV em um ZIP
+# Declarada antes de /voos/{id_voo} para não ser tomada por um id.
+# O ZIP fica em cache enquanto o CSV não muda; numa falta, é enviado
+# enquanto é comprimido. nivel vale para deflate (0-9) e bzip2 (1-9);
+# o zipfile não aplica nível ao lzma.
+@app.get("/voos/compactar")
+def compactar_csv(
+    algoritmo: Literal["deflate", "lzma", "bzip2"] = "deflate",
+    nivel: Optional[int] = Query(None, ge=0, le=9),
+):
+    verificar_csv()
+    try:
+        repositorio.consolidar()
+        gerador, tamanho = exportador.exportar(algoritmo, nivel)
+    except NivelInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao compactar arquivo: {e}")
+
+    headers = {"Content-Disposition": 'attachment; filename="voos.zip"'}
+    if tamanho is not None:
+        headers["Content-Length"] = str(tamanho)
+    return StreamingResponse(gerador, media_type="application/zip", headers=headers)
+
 # Funcionalidade 3: Obter um registro específico pelo ID
 @app.get("/voos/{id_voo}")
 def obter_voo(id_voo: int):
-    verificar_csv()
     try:
-        with open(CSV_FILE, "r") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                print(f"Analisando linha: {row}")  
-                if int(row["id_voo"]) == id_voo:
-                    return row
-        raise HTTPException(status_code=404, detail="Voo não encontrado.")
+        voo = repositorio.obter(id_voo)
     except Exception as e:
-        print(f"Erro ao buscar voo: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao buscar voo: {e}")
+    if voo is None:
+        raise HTTPException(status_code=404, detail="Voo não encontrado.")
+    return voo.para_json()
 
 # Funcionalidade 3: Atualizar um registro específico pelo ID
 @app.put("/voos/{id_voo}")
-def atualizar_voo(id_voo: int, voo_atualizado: Voo):
-    verificar_csv()
+async def atualizar_voo(id_voo: int, voo_atualizado: Voo):
     try:
-        atualizado = False
-        voos = []
-
-        with open(CSV_FILE, "r") as file:
-            reader = csv.DictReader(file, fieldnames=HEADER)
-            next(reader, None)
-            for row in reader:
-                if int(row["id_voo"]) == id_voo:
-                    voos.append({
-                        "id_voo": voo_atualizado.id_voo,
-                        "numero_voo": voo_atualizado.numero_voo,
-                        "cia": voo_atualizado.cia,
-                        "origem": voo_atualizado.origem,
-                        "destino": voo_atualizado.destino,
-                        "horario_partida": voo_atualizado.horario_partida.isoformat(),
-                        "horario_chegada": voo_atualizado.horario_chegada.isoformat(),
-                        "id_aeronave": voo_atualizado.id_aeronave,
-                        "status": voo_atualizado.status
-                    })
-                    atualizado = True
-                else:
-                    voos.append(row)
-
-        if not atualizado:
-            raise HTTPException(status_code=404, detail="Voo não encontrado.")
-
-        with open(CSV_FILE, "w", newline="") as file:
-            writer = csv.DictWriter(file, fieldnames=HEADER)
-            writer.writeheader()
-            writer.writerows(voos)
-
-        return {"message": "Voo atualizado com sucesso!"}
+        atualizado = await escritor.atualizar(id_voo, voo_para_registro(voo_atualizado))
+    except VooDuplicado:
+        raise HTTPException(status_code=409, detail="Já existe um voo com esse ID.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar voo: {e}")
 
+    if not atualizado:
+        raise HTTPException(status_code=404, detail="Voo não encontrado.")
+    return {"message": "Voo atualizado com sucesso!"}
+
 # Funcionalidade 3: Excluir um registro específico pelo ID
 @app.delete("/voos/{id_voo}")
-def deletar_voo(id_voo: int):
-    verificar_csv()
+async def deletar_voo(id_voo: int):
     try:
-        voos = []
-        deletado = False
-        
-        with open(CSV_FILE, "r") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if int(row["id_voo"]) == id_voo:
-                    deletado = True
-                else:
-                    voos.append(row)
-
-        if not deletado:
-            raise HTTPException(status_code=404, detail="Voo não encontrado.")
-
-        with open(CSV_FILE, "w", newline="") as file:
-            writer = csv.DictWriter(file, fieldnames=HEADER)
-            writer.writeheader()
-            writer.writerows(voos)
-
-        return {"message": "Voo deletado com sucesso!"}
+        deletado = await escritor.deletar(id_voo)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao deletar voo: {e}")
 
+    if not deletado:
+        raise HTTPException(status_code=404, detail="Voo não encontrado.")
+    return {"message": "Voo deletado com sucesso!"}
+
 # Funcionalidade 4: Contar o número de registros no CSV
 @app.get("/contar_registros")
 def contar_registros():
-    verificar_csv()
-    if os.stat(CSV_FILE).st_size == 0:
-        return {"Total de Registros": 0}
     try:
-        with open(CSV_FILE, "r") as file:
-            reader = csv.reader(file)
-            next(reader, None)
-            count = sum(1 for _ in reader)
-        return {"Total de Registros": count}
+        return {"Total de Registros": repositorio.contar()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao contar registros: {e}")
 
-# Funcionalidade 5: Compactar o arquivo CSV em um ZIP
-@app.get("/voos/compactar")
-def compactar_csv():
-    verificar_csv()
-    
-    zip_file = CSV_FILE.replace("voos.csv", "voos.zip")
-    
-    try:
-        with zipfile.ZipFile(zip_file, "w", zipfile.ZIP_DEFLATED) as zipf:
-            zipf.write(CSV_FILE, os.path.basename(CSV_FILE))
-
-        return FileResponse(
-            path=zip_file,
-            media_type="application/zip",
-            filename=os.path.basename(zip_file),
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao compactar arquivo: {e}")
-
-
 # Funcionalidade 6: Retornar o hash SHA256 do arquivo CSV
 @app.get("/hash/")
 def obter_hash():
     verificar_csv()
     try:
-        with open(CSV_FILE, "rb") as file:
-            sha256_hash = hashlib.sha256(file.read()).hexdigest()
-        return {"SHA256": sha256_hash}
+        repositorio.consolidar()
+        return {"SHA256": hash_csv.calcular()}
     except FileNotFoundError:
         return {"error": "Arquivo CSV não encontrado."}
     except Exception as e:
         return {"error": f"Erro ao calcular hash: {str(e)}"}
+
+# Funcionalidade 7: Métricas do serviço no formato texto do Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+def obter_metricas():
+    return PlainTextResponse(metricas.renderizar(), media_type="text/plain; version=0.0.4")
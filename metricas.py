@@ -0,0 +1,144 @@
+import threading
+import time
+
+# Limites, em segundos, dos buckets do histograma de duração das requisições.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _rotulos(**valores):
+    partes = []
+    for nome, valor in valores.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{nome}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+# Contadores do serviço, expostos em /metrics no formato texto do Prometheus:
+# duração e quantidade de requisições por rota, bytes lidos e escritos nos
+# arquivos CSV e acertos/faltas de cada cache.
+class Metricas:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._requisicoes = {}
+        self._duracoes = {}
+        self._bytes = {"lidos": 0, "escritos": 0}
+        self._caches = {}
+
+    def registrar_requisicao(self, metodo, rota, status, duracao):
+        with self._lock:
+            chave = (metodo, rota, status)
+            self._requisicoes[chave] = self._requisicoes.get(chave, 0) + 1
+            # [contagem por bucket..., soma, total]
+            histograma = self._duracoes.get((metodo, rota))
+            if histograma is None:
+                histograma = self._duracoes[(metodo, rota)] = [0] * len(self.buckets) + [0.0, 0]
+            for posicao, limite in enumerate(self.buckets):
+                if duracao <= limite:
+                    histograma[posicao] += 1
+            histograma[-2] += duracao
+            histograma[-1] += 1
+
+    def bytes_lidos(self, quantidade):
+        with self._lock:
+            self._bytes["lidos"] += quantidade
+
+    def bytes_escritos(self, quantidade):
+        with self._lock:
+            self._bytes["escritos"] += quantidade
+
+    def acesso_cache(self, cache, acerto):
+        with self._lock:
+            contagem = self._caches.setdefault(cache, [0, 0])
+            contagem[0 if acerto else 1] += 1
+
+    def renderizar(self):
+        with self._lock:
+            requisicoes = dict(self._requisicoes)
+            duracoes = {chave: list(valor) for chave, valor in self._duracoes.items()}
+            lidos = self._bytes["lidos"]
+            escritos = self._bytes["escritos"]
+            caches = {cache: list(valor) for cache, valor in self._caches.items()}
+
+        linhas = [
+            "# HELP voos_http_requisicoes_total Requisições HTTP atendidas.",
+            "# TYPE voos_http_requisicoes_total counter",
+        ]
+        for (metodo, rota, status), total in sorted(requisicoes.items()):
+            linhas.append("voos_http_requisicoes_total"
+                          f"{_rotulos(metodo=metodo, rota=rota, status=status)} {total}")
+
+        linhas += [
+            "# HELP voos_http_duracao_segundos Duração das requisições HTTP, até o último byte.",
+            "# TYPE voos_http_duracao_segundos histogram",
+        ]
+        for (metodo, rota), histograma in sorted(duracoes.items()):
+            for limite, total in zip(self.buckets, histograma):
+                linhas.append("voos_http_duracao_segundos_bucket"
+                              f"{_rotulos(metodo=metodo, rota=rota, le=limite)} {total}")
+            linhas.append("voos_http_duracao_segundos_bucket"
+                          f"{_rotulos(metodo=metodo, rota=rota, le='+Inf')} {histograma[-1]}")
+            linhas.append("voos_http_duracao_segundos_sum"
+                          f"{_rotulos(metodo=metodo, rota=rota)} {_numero(histograma[-2])}")
+            linhas.append("voos_http_duracao_segundos_count"
+                          f"{_rotulos(metodo=metodo, rota=rota)} {histograma[-1]}")
+
+        linhas += [
+            "# HELP voos_csv_bytes_lidos_total Bytes lidos dos arquivos CSV.",
+            "# TYPE voos_csv_bytes_lidos_total counter",
+            f"voos_csv_bytes_lidos_total {lidos}",
+            "# HELP voos_csv_bytes_escritos_total Bytes escritos nos arquivos CSV.",
+            "# TYPE voos_csv_bytes_escritos_total counter",
+            f"voos_csv_bytes_escritos_total {escritos}",
+            "# HELP voos_cache_acessos_total Consultas aos caches, por resultado.",
+            "# TYPE voos_cache_acessos_total counter",
+        ]
+        for cache, (acertos, faltas) in sorted(caches.items()):
+            linhas.append(f"voos_cache_acessos_total{_rotulos(cache=cache, resultado='acerto')} {acertos}")
+            linhas.append(f"voos_cache_acessos_total{_rotulos(cache=cache, resultado='falta')} {faltas}")
+        linhas += [
+            "# HELP voos_cache_taxa_acerto Fração das consultas ao cache que foram acertos.",
+            "# TYPE voos_cache_taxa_acerto gauge",
+        ]
+        for cache, (acertos, faltas) in sorted(caches.items()):
+            linhas.append(f"voos_cache_taxa_acerto{_rotulos(cache=cache)} "
+                          f"{_numero(acertos / (acertos + faltas))}")
+        return "\n".join(linhas) + "\n"
+
+
+# Middleware ASGI que mede cada requisição até o fim da resposta, inclusive
+# as enviadas em streaming. A rota é o caminho declarado (/voos/{id_voo}),
+# não o recebido, para não criar uma série por id.
+class MiddlewareMetricas:
+    def __init__(self, app, metricas):
+        self.app = app
+        self.metricas = metricas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            rota = scope.get("route")
+            self.metricas.registrar_requisicao(
+                scope["method"], getattr(rota, "path", "nao_encontrada"),
+                status, time.perf_counter() - inicio)
+
+
+metricas = Metricas()
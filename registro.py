@@ -0,0 +1,103 @@
+import json
+import sys
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+# orjson é opcional: quando instalado, serializa as listas bem mais rápido.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Horários entram como o texto gravado, para o CSV e o JSON devolverem
+# exatamente o que foi salvo; os que chegam como datetime (do pydantic)
+# viram texto com isoformat(), como o serviço sempre gravou. Muitos voos
+# saem no mesmo horário, então o texto é internado.
+def texto_horario(valor):
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    return sys.intern(valor)
+
+
+# Os horários já convertidos por ler_horario são reaproveitados em vez de
+# criar um datetime por linha. O cache é esvaziado ao passar deste tamanho.
+LIMITE_CACHE_HORARIOS = 100000
+
+_horarios = {}
+
+
+# Horário como datetime com fuso, só para comparar e indexar; sem fuso é
+# tratado como UTC. Devolve None se o texto não for uma data ISO.
+def ler_horario(valor):
+    if isinstance(valor, datetime):
+        return valor if valor.tzinfo is not None else valor.replace(tzinfo=timezone.utc)
+    horario = _horarios.get(valor)
+    if horario is None:
+        try:
+            horario = datetime.fromisoformat(valor)
+        except ValueError:
+            return None
+        if horario.tzinfo is None:
+            horario = horario.replace(tzinfo=timezone.utc)
+        if len(_horarios) >= LIMITE_CACHE_HORARIOS:
+            _horarios.clear()
+        _horarios[valor] = horario
+    return horario
+
+
+# Um voo na memória: tupla com os inteiros já convertidos e os textos
+# repetidos (companhia, aeroportos, status, horários) internados, para que
+# todas as linhas compartilhem a mesma string.
+class RegistroVoo(NamedTuple):
+    id_voo: int
+    numero_voo: int
+    cia: str
+    origem: str
+    destino: str
+    horario_partida: str
+    horario_chegada: str
+    id_aeronave: int
+    status: str
+
+    # Monta o registro a partir dos campos na ordem de HEADER, como vêm
+    # do CSV (texto) ou do SQLite.
+    @classmethod
+    def de_campos(cls, id_voo, numero_voo, cia, origem, destino,
+                  horario_partida, horario_chegada, id_aeronave, status):
+        return cls(int(id_voo), int(numero_voo), sys.intern(cia),
+                   sys.intern(origem), sys.intern(destino),
+                   texto_horario(horario_partida), texto_horario(horario_chegada),
+                   int(id_aeronave), sys.intern(status))
+
+    def para_csv(self):
+        return [str(self.id_voo), str(self.numero_voo), self.cia, self.origem,
+                self.destino, self.horario_partida, self.horario_chegada,
+                str(self.id_aeronave), self.status]
+
+    def para_json(self):
+        return {
+            "id_voo": self.id_voo,
+            "numero_voo": self.numero_voo,
+            "cia": self.cia,
+            "origem": self.origem,
+            "destino": self.destino,
+            "horario_partida": self.horario_partida,
+            "horario_chegada": self.horario_chegada,
+            "id_aeronave": self.id_aeronave,
+            "status": self.status,
+        }
+
+
+def serializar_json(registros):
+    objetos = [registro.para_json() for registro in registros]
+    if orjson is not None:
+        return orjson.dumps(objetos)
+    return json.dumps(objetos, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def serializar_ndjson(registros):
+    if orjson is not None:
+        return b"".join(orjson.dumps(registro.para_json()) + b"\n" for registro in registros)
+    return "".join(json.dumps(registro.para_json(), ensure_ascii=False, separators=(",", ":")) + "\n"
+                   for registro in registros).encode()
@@ -0,0 +1,506 @@
+import bisect
+import csv
+import io
+import os
+import threading
+from itertools import islice
+
+from armazenamento import (CAMPOS_INDEXADOS, HEADER, Armazenamento, VooDuplicado,
+                            gravar_temporario, substituir)
+from metricas import metricas
+from registro import RegistroVoo, ler_horario
+
+CSV_FILE = "voos.csv"
+
+# Log de escrita: cada linha é uma operação seguida das colunas de HEADER.
+# "U" grava a linha completa (upsert) e "D" só precisa do id_voo (tombstone).
+OP_UPSERT = "U"
+OP_DELETE = "D"
+
+# Tamanho do log, em bytes, a partir do qual o CSV é reescrito em segundo plano.
+LIMITE_LOG = 4 * 1024 * 1024
+
+# Um intervalo de horários de partida com menos de 1/FRACAO_PARTIDA dos ids
+# da menor lista dos filtros é ordenado e percorrido no lugar dela.
+FRACAO_PARTIDA = 8
+
+
+def _stat(caminho):
+    try:
+        stat = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# Mantém o conteúdo do CSV em memória, indexado por id_voo, como RegistroVoo.
+# O arquivo é lido uma única vez e só volta a ser lido quando
+# alguém o altera por fora (mudança de mtime ou tamanho).
+#
+# Com log_escrita ativo, atualizações e exclusões não reescrevem o CSV:
+# viram registros no final de "<csv>.log", aplicados por cima do CSV na
+# leitura. Quando o log passa de limite_log, uma thread gera o CSV novo
+# num arquivo temporário e o troca de lugar com os.replace.
+#
+# As operações de escrita primeiro alteram a memória e depois são gravadas
+# por descarregar(); aplicar_lote() permite gravar várias operações juntas.
+class RepositorioVoos(Armazenamento):
+    def __init__(self, caminho=CSV_FILE, header=HEADER,
+                 log_escrita=True, limite_log=LIMITE_LOG):
+        super().__init__()
+        self.caminho = caminho
+        self.caminho_csv = caminho
+        self.header = header
+        self.log_escrita = log_escrita
+        self.limite_log = limite_log
+        self.caminho_log = caminho + ".log"
+        self.caminho_log_compactando = caminho + ".log.compactando"
+        self._voos = {}
+        # Índices secundários. _ordem guarda um número crescente por id, na
+        # mesma ordem de _voos, usado para ordenar resultados e como cursor.
+        # _ids_ordem e as listas de _indices (valor -> ids) ficam ordenadas
+        # por _ordem, para a paginação continuar do cursor com bisect.
+        self._ordem = {}
+        self._sequencia = 0
+        self._ids_ordem = []
+        self._indices = {campo: {} for campo in CAMPOS_INDEXADOS}
+        self._partidas = {}
+        # Índice ordenado por horário de partida: _datas_partida[i] é a
+        # partida de _ids_partida[i]. Mantido a cada escrita; durante
+        # carregar() fica None e é montado uma vez no final.
+        self._datas_partida = []
+        self._ids_partida = []
+        self._assinatura = None
+        self._lock = threading.RLock()
+        # ids citados nos logs; uma inserção desses ids precisa ir para o log
+        # para não ser desfeita por um tombstone anterior na releitura.
+        self._ids_log = set()
+        self._ids_compactando = set()
+        # Verdadeiro enquanto uma compactação roda; quem precisa esperar por
+        # ela espera em _compactacao_concluida, nunca na thread que compacta.
+        self._compactando = False
+        self._compactacao_concluida = threading.Condition(self._lock)
+        # Escritas aplicadas na memória que ainda não foram para o disco.
+        # descarregar() grava tudo de uma vez, com um único fsync por arquivo.
+        self._pendente_csv = []
+        self._pendente_log = []
+        self._reescrita_pendente = False
+        self._gravando = False
+        self._lock_escrita = threading.Lock()
+
+    def verificar_csv(self):
+        if not os.path.exists(self.caminho):
+            with open(self.caminho, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(self.header)
+
+    def _assinatura_arquivo(self):
+        return (_stat(self.caminho), _stat(self.caminho_log),
+                _stat(self.caminho_log_compactando))
+
+    def _retirar_ordenado(self, ids, id_voo):
+        del ids[bisect.bisect_left(ids, self._ordem[id_voo], key=self._ordem.__getitem__)]
+
+    def _indexar(self, id_voo, registro):
+        ordem = self._ordem
+        posicao = ordem[id_voo]
+        for campo in CAMPOS_INDEXADOS:
+            ids = self._indices[campo].setdefault(getattr(registro, campo), [])
+            # Ids novos têm a maior _ordem e vão sempre para o final.
+            if not ids or ordem[ids[-1]] < posicao:
+                ids.append(id_voo)
+            else:
+                bisect.insort(ids, id_voo, key=ordem.__getitem__)
+        partida = ler_horario(registro.horario_partida)
+        if partida is not None:
+            self._partidas[id_voo] = partida
+            if self._datas_partida is not None:
+                posicao = bisect.bisect_right(self._datas_partida, partida)
+                self._datas_partida.insert(posicao, partida)
+                self._ids_partida.insert(posicao, id_voo)
+
+    def _desindexar(self, id_voo, registro):
+        for campo in CAMPOS_INDEXADOS:
+            valor = getattr(registro, campo)
+            ids = self._indices[campo].get(valor)
+            if ids is not None:
+                self._retirar_ordenado(ids, id_voo)
+                if not ids:
+                    del self._indices[campo][valor]
+        partida = self._partidas.pop(id_voo, None)
+        if partida is not None and self._datas_partida is not None:
+            inicio = bisect.bisect_left(self._datas_partida, partida)
+            fim = bisect.bisect_right(self._datas_partida, partida, lo=inicio)
+            posicao = self._ids_partida.index(id_voo, inicio, fim)
+            del self._datas_partida[posicao]
+            del self._ids_partida[posicao]
+
+    # Toda alteração de _voos passa por _colocar e _remover, que mantêm
+    # os índices em dia.
+    def _colocar(self, id_voo, registro):
+        antigo = self._voos.get(id_voo)
+        if antigo is None:
+            self._sequencia += 1
+            self._ordem[id_voo] = self._sequencia
+            self._ids_ordem.append(id_voo)
+        else:
+            self._desindexar(id_voo, antigo)
+        self._voos[id_voo] = registro
+        self._indexar(id_voo, registro)
+
+    def _remover(self, id_voo):
+        registro = self._voos.pop(id_voo, None)
+        if registro is not None:
+            self._desindexar(id_voo, registro)
+            self._retirar_ordenado(self._ids_ordem, id_voo)
+            del self._ordem[id_voo]
+        return registro
+
+    def _aplicar_log(self, caminho, ids):
+        if not os.path.exists(caminho):
+            return
+        with open(caminho, "r", newline="") as file:
+            metricas.bytes_lidos(os.fstat(file.fileno()).st_size)
+            for campos in csv.reader(file):
+                if not campos:
+                    continue
+                operacao = campos[0]
+                id_voo = int(campos[1])
+                ids.add(id_voo)
+                if operacao == OP_UPSERT:
+                    self._colocar(id_voo, RegistroVoo.de_campos(*campos[1:]))
+                elif operacao == OP_DELETE:
+                    self._remover(id_voo)
+
+    def carregar(self):
+        with self._lock:
+            self.verificar_csv()
+            self._voos = {}
+            # A sequência recomeça a cada leitura: assim o cursor continua
+            # sendo a posição no arquivo e vale depois de uma releitura.
+            self._ordem = {}
+            self._sequencia = 0
+            self._ids_ordem = []
+            self._indices = {campo: {} for campo in CAMPOS_INDEXADOS}
+            self._partidas = {}
+            self._datas_partida = None
+            with open(self.caminho, "r", newline="") as file:
+                metricas.bytes_lidos(os.fstat(file.fileno()).st_size)
+                reader = csv.reader(file)
+                cabecalho = next(reader, None)
+                # Colunas fora da ordem de HEADER são reordenadas.
+                posicoes = None
+                if cabecalho and cabecalho != HEADER:
+                    posicoes = [cabecalho.index(campo) for campo in HEADER]
+                for campos in reader:
+                    if not campos:
+                        continue
+                    if posicoes is not None:
+                        campos = [campos[posicao] for posicao in posicoes]
+                    registro = RegistroVoo.de_campos(*campos)
+                    # Em caso de ids repetidos no arquivo vale a primeira linha,
+                    # como na busca sequencial original.
+                    if registro.id_voo not in self._voos:
+                        self._colocar(registro.id_voo, registro)
+            ids_compactando = set()
+            ids_log = set()
+            self._aplicar_log(self.caminho_log_compactando, ids_compactando)
+            self._aplicar_log(self.caminho_log, ids_log)
+            ordenados = sorted(self._partidas.items(), key=lambda item: item[1])
+            self._ids_partida = [id_voo for id_voo, _ in ordenados]
+            self._datas_partida = [partida for _, partida in ordenados]
+            self._ids_compactando = ids_compactando
+            self._ids_log = ids_log
+            self._assinatura = self._assinatura_arquivo()
+
+    def _sincronizar(self):
+        self.verificar_csv()
+        # Durante uma gravação o arquivo ainda não bate com a memória,
+        # que já está à frente dele.
+        if self._gravando:
+            return
+        if self._assinatura != self._assinatura_arquivo():
+            metricas.acesso_cache("repositorio", False)
+            self.carregar()
+        else:
+            metricas.acesso_cache("repositorio", True)
+
+    def _gravar_temporario(self, linhas):
+        return gravar_temporario(self.caminho, self.header, linhas)
+
+    def _anexar(self, caminho, linhas):
+        with open(caminho, "a", newline="") as file:
+            antes = os.fstat(file.fileno()).st_size
+            writer = csv.writer(file)
+            writer.writerows(linhas)
+            file.flush()
+            os.fsync(file.fileno())
+            metricas.bytes_escritos(os.fstat(file.fileno()).st_size - antes)
+
+    def _anexar_csv(self, registros):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(registro.para_csv() for registro in registros)
+        texto = buffer.getvalue()
+        with open(self.caminho, "a", newline="") as file:
+            antes = os.fstat(file.fileno())
+            file.write(texto)
+            file.flush()
+            os.fsync(file.fileno())
+            depois = os.fstat(file.fileno())
+            dados = texto.encode(file.encoding)
+        metricas.bytes_escritos(len(dados))
+        for observador in self.observadores_anexacao:
+            observador(antes, dados, depois)
+
+    def _enfileirar_log(self, operacao, id_voo, registro=None):
+        if operacao == OP_UPSERT:
+            self._pendente_log.append([operacao] + registro.para_csv())
+        else:
+            self._pendente_log.append([operacao, str(id_voo)])
+        self._ids_log.add(id_voo)
+
+    def descarregar(self):
+        with self._lock_escrita:
+            with self._lock:
+                linhas_csv, self._pendente_csv = self._pendente_csv, []
+                linhas_log, self._pendente_log = self._pendente_log, []
+                reescrever, self._reescrita_pendente = self._reescrita_pendente, False
+                if not (linhas_csv or linhas_log or reescrever):
+                    return
+                instantaneo = list(self._voos.values()) if reescrever else None
+                self._gravando = True
+            try:
+                if reescrever:
+                    substituir(self._gravar_temporario(instantaneo), self.caminho)
+                elif linhas_csv:
+                    self._anexar_csv(linhas_csv)
+                if linhas_log:
+                    self._anexar(self.caminho_log, linhas_log)
+            except BaseException:
+                # A memória ficou à frente do disco: volta para o que foi gravado.
+                with self._lock:
+                    self._gravando = False
+                    self.carregar()
+                raise
+            with self._lock:
+                self._gravando = False
+                self._assinatura = self._assinatura_arquivo()
+                if linhas_log and os.path.getsize(self.caminho_log) >= self.limite_log:
+                    self._compactar_em_segundo_plano()
+
+    def _iniciar_compactacao(self):
+        # Chamado com o lock: separa o log atual para a compactação e tira
+        # uma cópia do estado; novas escritas seguem para um log novo.
+        if self._compactando or not os.path.exists(self.caminho_log):
+            return None
+        if os.path.exists(self.caminho_log_compactando):
+            # Sobra de uma compactação que falhou: junta os dois logs.
+            with open(self.caminho_log, "r", newline="") as origem, \
+                    open(self.caminho_log_compactando, "a", newline="") as destino:
+                destino.write(origem.read())
+            os.remove(self.caminho_log)
+        else:
+            os.replace(self.caminho_log, self.caminho_log_compactando)
+        self._ids_compactando |= self._ids_log
+        self._ids_log = set()
+        # Inserções ainda não gravadas já estão na cópia; se forem anexadas
+        # ao CSV antigo depois, seriam perdidas na troca, então vão para o log.
+        for registro in self._pendente_csv:
+            self._enfileirar_log(OP_UPSERT, registro.id_voo, registro)
+        self._pendente_csv = []
+        self._assinatura = self._assinatura_arquivo()
+        return list(self._voos.values())
+
+    def _concluir_compactacao(self, linhas):
+        try:
+            temporario = self._gravar_temporario(linhas)
+            # Espera qualquer anexação em andamento no CSV antigo terminar.
+            with self._lock_escrita, self._lock:
+                substituir(temporario, self.caminho)
+                os.remove(self.caminho_log_compactando)
+                self._ids_compactando = set()
+                self._assinatura = self._assinatura_arquivo()
+        finally:
+            with self._lock:
+                self._compactando = False
+                self._compactacao_concluida.notify_all()
+
+    def _compactar_em_segundo_plano(self):
+        linhas = self._iniciar_compactacao()
+        if linhas is None:
+            return
+        self._compactando = True
+        threading.Thread(target=self._concluir_compactacao, args=(linhas,), daemon=True).start()
+
+    # Aplica todo o log pendente no CSV antes de devolver, para quem
+    # precisa do arquivo em disco refletindo o estado atual.
+    def consolidar(self):
+        self.descarregar()
+        while True:
+            with self._lock:
+                while self._compactando:
+                    self._compactacao_concluida.wait()
+            # Como em descarregar(), o log só é separado com _lock_escrita:
+            # uma anexação em andamento poderia cair no log novo sem que o
+            # id fosse lembrado em _ids_log.
+            with self._lock_escrita, self._lock:
+                if self._compactando:
+                    continue
+                self._sincronizar()
+                if (not os.path.exists(self.caminho_log)
+                        and not os.path.exists(self.caminho_log_compactando)):
+                    return
+                if os.path.exists(self.caminho_log):
+                    linhas = self._iniciar_compactacao()
+                else:
+                    linhas = list(self._voos.values())
+                self._compactando = True
+            self._concluir_compactacao(linhas)
+            return
+
+    def listar(self):
+        with self._lock:
+            self._sincronizar()
+            return list(self._voos.values())
+
+    def obter(self, id_voo):
+        with self._lock:
+            self._sincronizar()
+            return self._voos.get(id_voo)
+
+    def contar(self):
+        with self._lock:
+            self._sincronizar()
+            return len(self._voos)
+
+    # Listagem filtrada e paginada usando os índices. filtros mapeia colunas
+    # de CAMPOS_INDEXADOS para o valor exato; partida_de/partida_ate limitam
+    # o horário de partida (inclusive). Os resultados seguem a ordem do
+    # arquivo; cursor é o valor devolvido na página anterior e continua logo
+    # depois dela. Devolve (linhas, cursor da próxima página ou None).
+    #
+    # A consulta percorre, a partir do cursor, a menor lista de ids em ordem
+    # entre as dos filtros e confere os demais filtros no próprio registro,
+    # parando quando a página enche.
+    def consultar(self, filtros=None, partida_de=None, partida_ate=None,
+                  offset=0, limit=None, cursor=None):
+        with self._lock:
+            self._sincronizar()
+            ordem = self._ordem.__getitem__
+            filtros = filtros or {}
+            fonte = self._ids_ordem
+            conferir = dict(filtros)
+            escolhido = None
+            for campo, valor in filtros.items():
+                ids = self._indices[campo].get(valor, [])
+                if escolhido is None or len(ids) < len(fonte):
+                    fonte, escolhido = ids, campo
+            conferir.pop(escolhido, None)
+
+            partida_de = ler_horario(partida_de) if partida_de is not None else None
+            partida_ate = ler_horario(partida_ate) if partida_ate is not None else None
+            por_partida = partida_de is not None or partida_ate is not None
+            if por_partida:
+                datas = self._datas_partida
+                inicio = bisect.bisect_left(datas, partida_de) if partida_de is not None else 0
+                fim = bisect.bisect_right(datas, partida_ate) if partida_ate is not None else len(datas)
+                if (fim - inicio) * FRACAO_PARTIDA < len(fonte):
+                    fonte = sorted(self._ids_partida[inicio:fim], key=ordem)
+                    conferir = dict(filtros)
+                    por_partida = False
+
+            def aceita(id_voo):
+                registro = self._voos[id_voo]
+                for campo, valor in conferir.items():
+                    if getattr(registro, campo) != valor:
+                        return False
+                if por_partida:
+                    partida = self._partidas.get(id_voo)
+                    return (partida is not None
+                            and (partida_de is None or partida >= partida_de)
+                            and (partida_ate is None or partida <= partida_ate))
+                return True
+
+            posicao = 0 if cursor is None else bisect.bisect_right(fonte, cursor, key=ordem)
+            fim = None if limit is None else offset + limit
+            if conferir or por_partida:
+                restantes = (fonte[indice] for indice in range(posicao, len(fonte)))
+                ids = islice(filter(aceita, restantes), offset, fim)
+            else:
+                ids = fonte[posicao + offset:None if fim is None else posicao + fim]
+            pagina = [self._voos[id_voo] for id_voo in ids]
+
+            proximo = None
+            if limit is not None and len(pagina) == limit:
+                proximo = self._ordem[pagina[-1].id_voo]
+            return pagina, proximo
+
+    def _inserir(self, registro):
+        self._sincronizar()
+        id_voo = registro.id_voo
+        if id_voo in self._voos:
+            raise VooDuplicado(id_voo)
+        if (self._compactando or self._ids_compactando
+                or id_voo in self._ids_log):
+            self._enfileirar_log(OP_UPSERT, id_voo, registro)
+        else:
+            self._pendente_csv.append(registro)
+        self._colocar(id_voo, registro)
+
+    def _atualizar(self, id_voo, registro):
+        self._sincronizar()
+        if id_voo not in self._voos:
+            return False
+        novo_id = registro.id_voo
+        if novo_id != id_voo and novo_id in self._voos:
+            raise VooDuplicado(novo_id)
+        if novo_id != id_voo:
+            self._remover(id_voo)
+            if self.log_escrita:
+                self._enfileirar_log(OP_DELETE, id_voo)
+        self._colocar(novo_id, registro)
+        if self.log_escrita:
+            self._enfileirar_log(OP_UPSERT, novo_id, registro)
+        else:
+            self._reescrita_pendente = True
+        return True
+
+    def _deletar(self, id_voo):
+        self._sincronizar()
+        if self._remover(id_voo) is None:
+            return False
+        if self.log_escrita:
+            self._enfileirar_log(OP_DELETE, id_voo)
+        else:
+            self._reescrita_pendente = True
+        return True
+
+    # Todas as operações do lote saem num único descarregar().
+    def aplicar_lote(self, operacoes):
+        resultados = []
+        with self._lock:
+            for nome, args in operacoes:
+                try:
+                    resultados.append(getattr(self, "_" + nome)(*args))
+                except Exception as e:
+                    resultados.append(e)
+        self.descarregar()
+        return resultados
+
+    def inserir(self, registro):
+        with self._lock:
+            self._inserir(registro)
+        self.descarregar()
+
+    def atualizar(self, id_voo, registro):
+        with self._lock:
+            atualizado = self._atualizar(id_voo, registro)
+        self.descarregar()
+        return atualizado
+
+    def deletar(self, id_voo):
+        with self._lock:
+            deletado = self._deletar(id_voo)
+        self.descarregar()
+        return deletado
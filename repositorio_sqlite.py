@@ -0,0 +1,301 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import timezone
+
+from armazenamento import CAMPOS_INDEXADOS, HEADER, Armazenamento, VooDuplicado
+from registro import RegistroVoo, ler_horario
+
+# Conexões de leitura mantidas abertas; as escritas usam uma conexão própria.
+TAMANHO_POOL = 4
+
+# Linhas inseridas por transação em importar().
+TAMANHO_BLOCO_IMPORTACAO = 10000
+
+# Faixa do INTEGER do SQLite. Um id_voo fora dela não pode estar no banco
+# e o sqlite3 nem aceita o parâmetro (OverflowError).
+MENOR_ID = -2 ** 63
+MAIOR_ID = 2 ** 63 - 1
+
+# partida_utc guarda horario_partida convertido para UTC num texto que
+# ordena como data, já que o CSV mistura "T" e espaço e fusos diferentes.
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS voos (
+    id_voo INTEGER PRIMARY KEY,
+    numero_voo INTEGER NOT NULL,
+    cia TEXT NOT NULL,
+    origem TEXT NOT NULL,
+    destino TEXT NOT NULL,
+    horario_partida TEXT NOT NULL,
+    horario_chegada TEXT NOT NULL,
+    id_aeronave INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    partida_utc TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_voos_cia ON voos (cia);
+CREATE INDEX IF NOT EXISTS idx_voos_origem ON voos (origem);
+CREATE INDEX IF NOT EXISTS idx_voos_destino ON voos (destino);
+CREATE INDEX IF NOT EXISTS idx_voos_status ON voos (status);
+CREATE INDEX IF NOT EXISTS idx_voos_horario_partida ON voos (partida_utc);
+"""
+
+COLUNAS = ", ".join(HEADER)
+SQL_OBTER = f"SELECT {COLUNAS} FROM voos WHERE id_voo = ?"
+SQL_LISTAR = f"SELECT {COLUNAS} FROM voos ORDER BY id_voo"
+SQL_CONTAR = "SELECT COUNT(*) FROM voos"
+SQL_INSERIR = (f"INSERT INTO voos ({COLUNAS}, partida_utc) "
+               f"VALUES ({', '.join('?' * (len(HEADER) + 1))})")
+SQL_SUBSTITUIR = SQL_INSERIR.replace("INSERT", "INSERT OR REPLACE", 1)
+SQL_ATUALIZAR = (f"UPDATE voos SET {', '.join(f'{campo} = ?' for campo in HEADER)}, "
+                 f"partida_utc = ? WHERE id_voo = ?")
+SQL_DELETAR = "DELETE FROM voos WHERE id_voo = ?"
+
+
+def _partida_utc(valor):
+    partida = ler_horario(valor)
+    if partida is None:
+        return None
+    return partida.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def _cabe_no_banco(id_voo):
+    return MENOR_ID <= id_voo <= MAIOR_ID
+
+
+def _parametros(registro):
+    return registro.para_csv() + [_partida_utc(registro.horario_partida)]
+
+
+# Armazenamento em SQLite: WAL para leituras não esperarem as escritas,
+# id_voo como chave primária e índices nas colunas filtradas pela listagem.
+# As consultas usam SQL fixo com parâmetros, que o sqlite3 prepara uma vez
+# por conexão e reaproveita.
+class RepositorioSQLite(Armazenamento):
+    def __init__(self, caminho, header=HEADER, tamanho_pool=TAMANHO_POOL):
+        super().__init__()
+        self.caminho = caminho
+        self.header = header
+        self.caminho_csv = caminho + ".csv"
+        self.tamanho_pool = tamanho_pool
+        self._pool = None
+        self._escrita = None
+        self._lock_escrita = threading.Lock()
+        self._lock_abertura = threading.Lock()
+        # Versão dos dados, para saber se caminho_csv está atualizado.
+        self._versao = 0
+        self._versao_csv = None
+
+    def _abrir(self):
+        conexao = sqlite3.connect(self.caminho, check_same_thread=False,
+                                  isolation_level=None, cached_statements=256)
+        conexao.execute("PRAGMA journal_mode = WAL")
+        conexao.execute("PRAGMA synchronous = FULL")
+        return conexao
+
+    def carregar(self):
+        with self._lock_abertura:
+            if self._pool is not None:
+                return
+            self._escrita = self._abrir()
+            self._escrita.executescript(ESQUEMA)
+            pool = queue.Queue()
+            for _ in range(self.tamanho_pool):
+                pool.put(self._abrir())
+            self._pool = pool
+
+    def fechar(self):
+        with self._lock_abertura:
+            if self._pool is None:
+                return
+            while not self._pool.empty():
+                self._pool.get_nowait().close()
+            self._escrita.close()
+            self._pool = None
+            self._escrita = None
+
+    @contextmanager
+    def _conexao(self):
+        self.carregar()
+        conexao = self._pool.get()
+        try:
+            yield conexao
+        finally:
+            self._pool.put(conexao)
+
+    def obter(self, id_voo):
+        if not _cabe_no_banco(id_voo):
+            return None
+        with self._conexao() as conexao:
+            campos = conexao.execute(SQL_OBTER, (id_voo,)).fetchone()
+        return RegistroVoo.de_campos(*campos) if campos is not None else None
+
+    def listar(self):
+        with self._conexao() as conexao:
+            return [RegistroVoo.de_campos(*campos) for campos in conexao.execute(SQL_LISTAR)]
+
+    def contar(self):
+        with self._conexao() as conexao:
+            return conexao.execute(SQL_CONTAR).fetchone()[0]
+
+    # Mesmo contrato de RepositorioVoos.consultar; aqui a ordem é a do
+    # id_voo e o cursor é o último id_voo da página.
+    def consultar(self, filtros=None, partida_de=None, partida_ate=None,
+                  offset=0, limit=None, cursor=None):
+        condicoes = []
+        parametros = []
+        for campo, valor in (filtros or {}).items():
+            if campo not in CAMPOS_INDEXADOS:
+                raise ValueError(f"Filtro desconhecido: {campo}")
+            condicoes.append(f"{campo} = ?")
+            parametros.append(valor)
+        if partida_de is not None:
+            condicoes.append("partida_utc >= ?")
+            parametros.append(_partida_utc(partida_de))
+        if partida_ate is not None:
+            condicoes.append("partida_utc <= ?")
+            parametros.append(_partida_utc(partida_ate))
+        if cursor is not None and cursor >= MENOR_ID:
+            # Depois de MAIOR_ID não há mais nada.
+            condicoes.append("id_voo > ?")
+            parametros.append(min(cursor, MAIOR_ID))
+
+        sql = f"SELECT {COLUNAS} FROM voos"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY id_voo LIMIT ? OFFSET ?"
+        parametros += [-1 if limit is None else limit, offset]
+
+        with self._conexao() as conexao:
+            pagina = [RegistroVoo.de_campos(*campos) for campos in conexao.execute(sql, parametros)]
+        proximo = None
+        if limit is not None and len(pagina) == limit:
+            proximo = pagina[-1].id_voo
+        return pagina, proximo
+
+    def _inserir(self, conexao, registro):
+        try:
+            conexao.execute(SQL_INSERIR, _parametros(registro))
+        except sqlite3.IntegrityError:
+            raise VooDuplicado(registro.id_voo)
+
+    def _atualizar(self, conexao, id_voo, registro):
+        if not _cabe_no_banco(id_voo):
+            return False
+        try:
+            cursor = conexao.execute(SQL_ATUALIZAR, _parametros(registro) + [id_voo])
+        except sqlite3.IntegrityError:
+            raise VooDuplicado(registro.id_voo)
+        return cursor.rowcount > 0
+
+    def _deletar(self, conexao, id_voo):
+        if not _cabe_no_banco(id_voo):
+            return False
+        return conexao.execute(SQL_DELETAR, (id_voo,)).rowcount > 0
+
+    # Uma transação por lote: um único commit (e fsync) para todas as
+    # operações. Uma operação que falha desfaz só a própria instrução.
+    def aplicar_lote(self, operacoes):
+        self.carregar()
+        resultados = []
+        with self._lock_escrita:
+            conexao = self._escrita
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                for nome, args in operacoes:
+                    try:
+                        resultados.append(getattr(self, "_" + nome)(conexao, *args))
+                    except Exception as e:
+                        resultados.append(e)
+                conexao.execute("COMMIT")
+            except BaseException:
+                conexao.execute("ROLLBACK")
+                raise
+            self._versao += 1
+        return resultados
+
+    def inserir(self, registro):
+        resultado = self.aplicar_lote([("inserir", (registro,))])[0]
+        if isinstance(resultado, Exception):
+            raise resultado
+
+    def atualizar(self, id_voo, registro):
+        resultado = self.aplicar_lote([("atualizar", (id_voo, registro))])[0]
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+
+    def deletar(self, id_voo):
+        return self.aplicar_lote([("deletar", (id_voo,))])[0]
+
+    # Regrava caminho_csv se houve escrita desde a última vez.
+    def consolidar(self):
+        with self._lock_escrita:
+            versao = self._versao
+            if self._versao_csv == versao and os.path.exists(self.caminho_csv):
+                return
+            self.exportar_csv(self.caminho_csv)
+            self._versao_csv = versao
+
+    def verificar_csv(self):
+        self.consolidar()
+
+    # Copia os registros para o banco, substituindo ids que já existam. Roda
+    # em transações de TAMANHO_BLOCO_IMPORTACAO linhas, então o serviço pode
+    # continuar lendo o banco durante a migração.
+    def importar(self, linhas):
+        self.carregar()
+        importadas = 0
+        for inicio in range(0, len(linhas), TAMANHO_BLOCO_IMPORTACAO):
+            bloco = linhas[inicio:inicio + TAMANHO_BLOCO_IMPORTACAO]
+            with self._lock_escrita:
+                conexao = self._escrita
+                conexao.execute("BEGIN IMMEDIATE")
+                try:
+                    conexao.executemany(SQL_SUBSTITUIR, (_parametros(registro) for registro in bloco))
+                    conexao.execute("COMMIT")
+                except BaseException:
+                    conexao.execute("ROLLBACK")
+                    raise
+                self._versao += 1
+            importadas += len(bloco)
+        return importadas
+
+
+# Migração entre o CSV e o banco:
+#   python repositorio_sqlite.py importar voos.csv voos.db
+#   python repositorio_sqlite.py exportar voos.db voos.csv
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migra voos entre CSV e SQLite.")
+    parser.add_argument("acao", choices=["importar", "exportar"])
+    parser.add_argument("origem")
+    parser.add_argument("destino")
+    args = parser.parse_args()
+
+    # Sem isso o CSV seria criado vazio (ou o banco, na exportação).
+    if not os.path.exists(args.origem):
+        parser.error(f"{args.origem} não existe.")
+
+    if args.acao == "importar":
+        # O CSV é lido pelo próprio RepositorioVoos, que aplica o log de
+        # escrita ao lado dele, se houver.
+        from repositorio import RepositorioVoos
+
+        fonte = RepositorioVoos(args.origem, log_escrita=False)
+        fonte.carregar()
+        banco = RepositorioSQLite(args.destino)
+        print(f"{banco.importar(fonte.listar())} voos importados.")
+        banco.fechar()
+    else:
+        # Logs de escrita de um CSV anterior seriam aplicados por cima da
+        # exportação na próxima leitura; o CSV novo já tem tudo.
+        for sufixo in (".log", ".log.compactando"):
+            if os.path.exists(args.destino + sufixo):
+                os.remove(args.destino + sufixo)
+        banco = RepositorioSQLite(args.origem)
+        banco.exportar_csv(args.destino)
+        print(f"{banco.contar()} voos exportados.")
+        banco.fechar()
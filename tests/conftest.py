@@ -0,0 +1,13 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+# O app usa caminhos relativos (voos.csv, exportacoes/): cada teste roda
+# num diretório vazio, e o lifespan recarrega o repositório a partir dele.
+@pytest.fixture
+def cliente(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import main
+
+    with TestClient(main.app) as cliente:
+        yield cliente
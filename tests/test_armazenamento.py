@@ -0,0 +1,30 @@
+import os
+import stat
+
+import pytest
+
+from armazenamento import Armazenamento
+from repositorio import RepositorioVoos
+
+
+def test_armazenamento_incompleto_nao_instancia():
+    class SemConsultar(Armazenamento):
+        def consolidar(self):
+            pass
+
+    with pytest.raises(TypeError):
+        SemConsultar()
+
+
+def test_exportar_csv_troca_o_arquivo_inteiro(tmp_path):
+    origem = RepositorioVoos(str(tmp_path / "origem.csv"))
+    origem.carregar()
+    destino = tmp_path / "destino.csv"
+    destino.write_text("lixo\n")
+    os.chmod(destino, 0o640)
+
+    origem.exportar_csv(str(destino))
+
+    assert destino.read_text().splitlines()[0].startswith("id_voo,")
+    assert stat.S_IMODE(os.stat(destino).st_mode) == 0o640
+    assert sorted(os.listdir(tmp_path)) == ["destino.csv", "origem.csv"]
@@ -0,0 +1,72 @@
+import io
+import os
+import zipfile
+
+from exportacao import ExportadorZip
+from hash_csv import HashArquivo
+
+
+def consumir(resultado):
+    gerador, _ = resultado
+    return b"".join(gerador)
+
+
+def conteudo(dados):
+    with zipfile.ZipFile(io.BytesIO(dados)) as zipf:
+        return zipf.read(zipf.namelist()[0])
+
+
+def exportador_de(tmp_path, texto):
+    csv = tmp_path / "voos.csv"
+    csv.write_bytes(texto)
+    return csv, ExportadorZip(str(csv), HashArquivo(str(csv)), str(tmp_path / "cache"))
+
+
+def test_zip_antigo_atrasado_nao_apaga_o_novo(tmp_path):
+    csv, exportador = exportador_de(tmp_path, b"id_voo\n1\n")
+
+    antigo, _ = exportador.exportar()
+    next(antigo)
+    csv.write_text("id_voo\n1\n2\n")
+    consumir(exportador.exportar())
+    for _ in antigo:
+        pass
+
+    assert len(os.listdir(tmp_path / "cache")) == 2
+    assert exportador.exportar()[1] is not None
+
+
+def test_lzma_ignora_nivel_no_cache(tmp_path):
+    _, exportador = exportador_de(tmp_path, b"id_voo\n1\n")
+
+    consumir(exportador.exportar("lzma", 1))
+    assert exportador.exportar("lzma", 9)[1] is not None
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+
+def test_anexacao_durante_a_exportacao_fica_fora_do_cache(tmp_path):
+    csv, exportador = exportador_de(tmp_path, b"id_voo\n1\n")
+
+    resultado = exportador.exportar()
+    with open(csv, "ab") as file:
+        file.write(b"50\n")
+    assert conteudo(consumir(resultado)) == b"id_voo\n1\n"
+
+    # De volta ao conteúdo do hash, o ZIP em cache é o do conteúdo original.
+    with open(csv, "r+b") as file:
+        file.truncate(len(b"id_voo\n1\n"))
+    gerador, tamanho = exportador.exportar()
+    assert tamanho is not None
+    assert conteudo(b"".join(gerador)) == b"id_voo\n1\n"
+
+
+def test_zip_em_cache_apagado_depois_de_escolhido(tmp_path):
+    _, exportador = exportador_de(tmp_path, b"id_voo\n1\n")
+    esperado = consumir(exportador.exportar())
+
+    gerador, tamanho = exportador.exportar()
+    for nome in os.listdir(tmp_path / "cache"):
+        os.remove(tmp_path / "cache" / nome)
+
+    assert b"".join(gerador) == esperado
+    assert tamanho == len(esperado)
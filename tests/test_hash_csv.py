@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+from hash_csv import HashArquivo
+from registro import RegistroVoo
+from repositorio import RepositorioVoos
+
+
+def sha256(caminho):
+    with open(caminho, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def voo(id_voo):
+    return RegistroVoo.de_campos(id_voo, 100 + id_voo, "Gol", "São Paulo", "Recife",
+                                 "2024-11-22 08:00:00+00:00", "2024-11-22 11:00:00+00:00",
+                                 7, "No Horário")
+
+
+def contar_leituras(hash_arquivo):
+    leituras = []
+    calcular_completo = hash_arquivo._calcular_completo
+
+    def contando():
+        leituras.append(1)
+        return calcular_completo()
+
+    hash_arquivo._calcular_completo = contando
+    return leituras
+
+
+def test_insercao_estende_o_hash_sem_reler(tmp_path):
+    repositorio = RepositorioVoos(str(tmp_path / "voos.csv"))
+    repositorio.carregar()
+    hash_arquivo = HashArquivo(repositorio.caminho)
+    repositorio.observadores_anexacao.append(hash_arquivo.anexado)
+    hash_arquivo.calcular()
+    leituras = contar_leituras(hash_arquivo)
+
+    repositorio.inserir(voo(1))
+    repositorio.inserir(voo(2))
+
+    assert hash_arquivo.calcular() == sha256(repositorio.caminho)
+    assert leituras == []
+
+
+def test_arquivo_trocado_recalcula(tmp_path):
+    caminho = tmp_path / "voos.csv"
+    caminho.write_text("id_voo\n1\n")
+    hash_arquivo = HashArquivo(str(caminho))
+    hash_arquivo.calcular()
+    leituras = contar_leituras(hash_arquivo)
+
+    novo = tmp_path / "novo.csv"
+    novo.write_text("id_voo\n2\n")
+    os.replace(novo, caminho)
+
+    assert hash_arquivo.calcular() == sha256(caminho)
+    assert leituras == [1]
+
+
+def test_anexacao_que_nao_bate_descarta_o_hash(tmp_path):
+    caminho = tmp_path / "voos.csv"
+    caminho.write_text("id_voo\n1\n")
+    hash_arquivo = HashArquivo(str(caminho))
+    hash_arquivo.calcular()
+    leituras = contar_leituras(hash_arquivo)
+
+    # Alguém anexou mais bytes do que os avisados.
+    with open(caminho, "ab") as file:
+        antes = os.fstat(file.fileno())
+        file.write(b"2\n3\n")
+        file.flush()
+        depois = os.fstat(file.fileno())
+    hash_arquivo.anexado(antes, b"2\n", depois)
+
+    assert hash_arquivo.calcular() == sha256(caminho)
+    assert leituras == [1]
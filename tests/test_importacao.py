@@ -0,0 +1,52 @@
+import asyncio
+
+from importacao import LinhaInvalida, ler_csv, ler_ndjson
+
+CABECALHO = "id_voo,numero_voo,cia,origem,destino,horario_partida,horario_chegada,id_aeronave,status\n"
+LINHA = "1,101,Gol,São Paulo,Recife,2024-11-22 08:00:00,2024-11-22 11:00:00,7,No Horário\n"
+
+
+def ler(funcao, pedacos):
+    async def gerar():
+        for pedaco in pedacos:
+            yield pedaco
+
+    async def coletar():
+        return [item async for item in funcao(gerar())]
+
+    return asyncio.run(coletar())
+
+
+def test_aspas_com_quebra_de_linha_entre_pedacos():
+    corpo = (CABECALHO + '1,101,Gol,São Paulo,Recife,2024-11-22 08:00:00,'
+             '2024-11-22 11:00:00,7,"Em\nvoo"\n' + LINHA).encode()
+    corte = corpo.index(b"Em\n") + 3
+    registros = ler(ler_csv, [corpo[:corte], corpo[corte:]])
+    assert [numero for numero, _ in registros] == [2, 3]
+    assert registros[0][1]["status"] == "Em\nvoo"
+    assert registros[1][1]["status"] == "No Horário"
+
+
+def test_bom_utf8_mesmo_cortado():
+    corpo = b"\xef\xbb\xbf" + (CABECALHO + LINHA).encode()
+    registros = ler(ler_csv, [corpo[:2], corpo[2:]])
+    assert registros == [(2, dict(zip(CABECALHO.strip().split(","), LINHA.strip().split(","))))]
+
+
+def test_ultima_linha_sem_quebra():
+    registros = ler(ler_csv, [(CABECALHO + LINHA + LINHA.replace("1,101", "2,102").rstrip()).encode()])
+    assert [registro["id_voo"] for _, registro in registros] == ["1", "2"]
+
+    objetos = ler(ler_ndjson, [b'{"id_voo": 1}\n{"id_voo": 2}'])
+    assert objetos == [(1, {"id_voo": 1}), (2, {"id_voo": 2})]
+
+
+def test_linhas_invalidas_com_numero():
+    corpo = (CABECALHO + "1,2,3\n\n" + LINHA).encode()
+    registros = ler(ler_csv, [corpo])
+    assert registros[0][0] == 2 and isinstance(registros[0][1], LinhaInvalida)
+    assert registros[1][0] == 4
+
+    objetos = ler(ler_ndjson, [b'{"id_voo": 1}\n[1]\n{quebrado\n'])
+    assert [numero for numero, _ in objetos] == [1, 2, 3]
+    assert all(isinstance(objeto, LinhaInvalida) for _, objeto in objetos[1:])
@@ -0,0 +1,53 @@
+import json
+
+CABECALHO = "id_voo,numero_voo,cia,origem,destino,horario_partida,horario_chegada,id_aeronave,status\n"
+
+
+def linha(id_voo, status="No Horário"):
+    return (f"{id_voo},{100 + id_voo},Gol,São Paulo,Recife,2024-11-22 08:00:00+00:00,"
+            f"2024-11-22 11:00:00+00:00,7,{status}\n")
+
+
+def enviar_csv(cliente, texto):
+    return cliente.post("/voos/bulk", content=texto.encode(), headers={"content-type": "text/csv"})
+
+
+def test_bulk_csv_insere_e_aponta_linhas_com_erro(cliente):
+    resposta = enviar_csv(cliente, CABECALHO + linha(1) + "x,1,2\n" + linha(2).replace("102", "abc")
+                          + linha(3) + linha(1, "Duplicado"))
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["inseridos"] == 2
+    assert [erro["linha"] for erro in corpo["erros"]] == [3, 4, 6]
+    assert "numero_voo" in corpo["erros"][1]["erro"]
+    assert corpo["erros"][2]["erro"] == "Já existe um voo com esse ID."
+    assert cliente.get("/voos/1").json()["status"] == "No Horário"
+    assert cliente.get("/contar_registros").json() == {"Total de Registros": 2}
+
+
+def test_bulk_ndjson_contra_voos_existentes(cliente):
+    enviar_csv(cliente, CABECALHO + linha(1))
+    objetos = [{"id_voo": id_voo, "numero_voo": 1, "cia": "Azul", "origem": "Natal",
+                "destino": "Belém", "horario_partida": "2024-11-22T08:00:00",
+                "horario_chegada": "2024-11-22T09:00:00", "id_aeronave": 3, "status": "Pousado"}
+               for id_voo in (1, 2)]
+    resposta = cliente.post("/voos/bulk", content="\n".join(map(json.dumps, objetos)),
+                            headers={"content-type": "application/x-ndjson"})
+    assert resposta.json()["inseridos"] == 1
+    assert resposta.json()["erros"] == [{"linha": 1, "erro": "Já existe um voo com esse ID."}]
+    assert cliente.get("/voos/1").json()["cia"] == "Gol"
+
+
+def test_bulk_recusa_tipo_desconhecido(cliente):
+    resposta = cliente.post("/voos/bulk", content=b"<voos/>", headers={"content-type": "application/xml"})
+    assert resposta.status_code == 415
+
+
+def test_compactar_envia_o_zip_do_csv(cliente):
+    enviar_csv(cliente, CABECALHO + linha(1))
+    primeira = cliente.get("/voos/compactar")
+    segunda = cliente.get("/voos/compactar")
+    assert primeira.status_code == segunda.status_code == 200
+    assert primeira.content == segunda.content
+    assert segunda.headers["content-length"] == str(len(segunda.content))
+    assert 'filename="voos.zip"' in segunda.headers["content-disposition"]
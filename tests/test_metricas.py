@@ -0,0 +1,56 @@
+import math
+
+from metricas import Metricas
+
+
+# Lê o texto de /metrics como {nome{rótulos}: valor}, sem os comentários.
+def amostras(texto):
+    valores = {}
+    for linha in texto.splitlines():
+        if linha and not linha.startswith("#"):
+            serie, valor = linha.rsplit(" ", 1)
+            valores[serie] = float(valor)
+    return valores
+
+
+# As métricas são globais ao processo; o teste olha só o que mudou.
+def test_rotas_e_histograma_pelo_app(cliente):
+    antes = amostras(cliente.get("/metrics").text)
+    cliente.get("/voos/1")
+    cliente.get("/voos/2")
+    cliente.get("/nada/aqui")
+    depois = amostras(cliente.get("/metrics").text)
+
+    def aumento(serie):
+        return depois.get(serie, 0) - antes.get(serie, 0)
+
+    assert aumento('voos_http_requisicoes_total'
+                   '{metodo="GET",rota="/voos/{id_voo}",status="404"}') == 2
+    assert aumento('voos_http_requisicoes_total'
+                   '{metodo="GET",rota="nao_encontrada",status="404"}') == 1
+    assert not [serie for serie in depois if 'rota="/voos/1"' in serie or "/nada/aqui" in serie]
+
+    contagens = {serie[len("voos_http_duracao_segundos_count"):]: total
+                 for serie, total in depois.items()
+                 if serie.startswith("voos_http_duracao_segundos_count")}
+    assert '{metodo="GET",rota="/voos/{id_voo}"}' in contagens
+    for rotulos, total in contagens.items():
+        buckets = [valor for serie, valor in depois.items()
+                   if serie.startswith("voos_http_duracao_segundos_bucket" + rotulos[:-1] + ",le=")]
+        assert buckets == sorted(buckets)
+        assert buckets[-1] == total
+        assert depois["voos_http_duracao_segundos_bucket" + rotulos[:-1] + ',le="+Inf"}'] == total
+
+
+def test_buckets_acumulam():
+    metricas = Metricas(buckets=(0.1, 1.0))
+    for duracao in (0.05, 0.5, 0.5, 5.0):
+        metricas.registrar_requisicao("GET", "/voos/", 200, duracao)
+    valores = amostras(metricas.renderizar())
+
+    rotulos = 'metodo="GET",rota="/voos/"'
+    assert valores[f'voos_http_duracao_segundos_bucket{{{rotulos},le="0.1"}}'] == 1
+    assert valores[f'voos_http_duracao_segundos_bucket{{{rotulos},le="1.0"}}'] == 3
+    assert valores[f'voos_http_duracao_segundos_bucket{{{rotulos},le="+Inf"}}'] == 4
+    assert valores[f'voos_http_duracao_segundos_count{{{rotulos}}}'] == 4
+    assert math.isclose(valores[f'voos_http_duracao_segundos_sum{{{rotulos}}}'], 6.05)
@@ -0,0 +1,149 @@
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from registro import RegistroVoo
+from repositorio import RepositorioVoos
+
+
+def voo(id_voo, status="No Horário"):
+    return RegistroVoo.de_campos(id_voo, 100 + id_voo, "Gol", "São Paulo", "Recife",
+                                 "2024-11-22 08:00:00+00:00", "2024-11-22 11:00:00+00:00",
+                                 7, status)
+
+
+@pytest.fixture
+def repositorio(tmp_path):
+    repositorio = RepositorioVoos(str(tmp_path / "voos.csv"))
+    repositorio.carregar()
+    for id_voo in range(1, 11):
+        repositorio.inserir(voo(id_voo))
+    return repositorio
+
+
+def test_consolidacoes_sobrepostas_terminam(repositorio):
+    repositorio.atualizar(3, voo(3, "Atrasado"))
+    gravar_temporario = repositorio._gravar_temporario
+    comecou = threading.Event()
+
+    def gravar_devagar(linhas):
+        comecou.set()
+        time.sleep(0.2)
+        return gravar_temporario(linhas)
+
+    repositorio._gravar_temporario = gravar_devagar
+    # As threads do executor continuam vivas depois de cada tarefa, como as
+    # do threadpool do FastAPI.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        primeira = executor.submit(repositorio.consolidar)
+        assert comecou.wait(5)
+        segunda = executor.submit(repositorio.consolidar)
+        primeira.result(timeout=5)
+        segunda.result(timeout=5)
+        executor.submit(repositorio.consolidar).result(timeout=5)
+
+    assert not os.path.exists(repositorio.caminho_log)
+    assert repositorio.obter(3).status == "Atrasado"
+
+
+def test_reescrita_mantem_permissoes(repositorio):
+    os.chmod(repositorio.caminho, 0o644)
+    repositorio.deletar(2)
+    repositorio.consolidar()
+    assert stat.S_IMODE(os.stat(repositorio.caminho).st_mode) == 0o644
+
+
+def test_consolidar_espera_anexacao_em_andamento(repositorio):
+    # A consolidação passa pelo seu descarregar() antes de a exclusão pegar
+    # o log pendente; depois disso a exclusão fica parada no meio da anexação.
+    repositorio.atualizar(3, voo(3, "Atrasado"))
+    descarregar = repositorio.descarregar
+    anexar = repositorio._anexar
+    anexando = threading.Event()
+    liberar = threading.Event()
+
+    def descarregar_e_esperar():
+        descarregar()
+        if threading.current_thread() is consolidacao:
+            assert anexando.wait(5)
+
+    def anexar_devagar(caminho, linhas):
+        anexando.set()
+        assert liberar.wait(5)
+        anexar(caminho, linhas)
+
+    repositorio.descarregar = descarregar_e_esperar
+    repositorio._anexar = anexar_devagar
+    consolidacao = threading.Thread(target=repositorio.consolidar)
+    exclusao = threading.Thread(target=repositorio.deletar, args=(5,))
+    consolidacao.start()
+    exclusao.start()
+    assert anexando.wait(5)
+    time.sleep(0.1)
+    liberar.set()
+    exclusao.join(5)
+    consolidacao.join(5)
+    repositorio.descarregar = descarregar
+    repositorio._anexar = anexar
+
+    repositorio.inserir(voo(5, "Cancelado"))
+    assert repositorio.obter(5).status == "Cancelado"
+    relido = RepositorioVoos(repositorio.caminho)
+    relido.carregar()
+    assert relido.obter(5).status == "Cancelado"
+
+
+def test_consulta_acompanha_escritas(repositorio):
+    repositorio.atualizar(4, voo(4)._replace(cia="Azul"))
+    repositorio.atualizar(6, voo(6)._replace(horario_partida="2024-11-23 08:00:00+00:00"))
+    repositorio.deletar(8)
+    repositorio.inserir(voo(11)._replace(cia="Azul"))
+
+    ids = []
+    pagina, cursor = repositorio.consultar({"cia": "Gol"}, limit=3)
+    while pagina:
+        ids += [registro.id_voo for registro in pagina]
+        pagina, cursor = (repositorio.consultar({"cia": "Gol"}, limit=3, cursor=cursor)
+                          if cursor is not None else ([], None))
+    assert ids == [1, 2, 3, 5, 6, 7, 9, 10]
+
+    pagina, _ = repositorio.consultar(partida_de="2024-11-23 00:00:00+00:00")
+    assert [registro.id_voo for registro in pagina] == [6]
+    pagina, _ = repositorio.consultar({"cia": "Azul"}, partida_ate="2024-11-22 12:00:00+00:00")
+    assert [registro.id_voo for registro in pagina] == [4, 11]
+
+
+def test_reescrita_preserva_o_texto_das_linhas(tmp_path):
+    caminho = tmp_path / "voos.csv"
+    linhas = ["id_voo,numero_voo,cia,origem,destino,horario_partida,horario_chegada,id_aeronave,status",
+              "1,101,Gol,São Paulo,Recife,2024-11-22 08:00:00,2024-11-22 11:00:00+00:00,7,No Horário",
+              "2,102,Azul,Recife,Natal,2024-11-22T09:00:00-03:00,2024-11-22T10:00:00-03:00,8,Atrasado",
+              "3,103,Gol,Natal,Belém,2024-11-22 12:00:00+00:00,2024-11-22 15:00:00+00:00,9,Pousado"]
+    caminho.write_bytes(("\r\n".join(linhas) + "\r\n").encode())
+    repositorio = RepositorioVoos(str(caminho))
+    repositorio.carregar()
+
+    repositorio.deletar(3)
+    repositorio.consolidar()
+
+    assert caminho.read_bytes() == ("\r\n".join(linhas[:3]) + "\r\n").encode()
+    assert repositorio.obter(1).para_json()["horario_partida"] == "2024-11-22 08:00:00"
+
+
+def test_cursor_continua_depois_de_releitura(repositorio):
+    pagina, cursor = repositorio.consultar(limit=3)
+    assert [registro.id_voo for registro in pagina] == [1, 2, 3]
+
+    # Alteração por fora: o repositório relê o arquivo na próxima consulta.
+    with open(repositorio.caminho, "a", newline="") as file:
+        file.write(",".join(voo(11).para_csv()) + "\r\n")
+
+    ids = []
+    while cursor is not None:
+        pagina, cursor = repositorio.consultar(limit=3, cursor=cursor)
+        ids += [registro.id_voo for registro in pagina]
+    assert ids == [4, 5, 6, 7, 8, 9, 10, 11]
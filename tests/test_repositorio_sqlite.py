@@ -0,0 +1,142 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from armazenamento import VooDuplicado
+from escritor import EscritorVoos
+from registro import RegistroVoo
+from repositorio import RepositorioVoos
+from repositorio_sqlite import RepositorioSQLite
+
+
+def voo(id_voo, cia="Gol", status="No Horário", partida="2024-11-22 08:00:00+00:00"):
+    return RegistroVoo.de_campos(id_voo, 100 + id_voo, cia, "São Paulo", "Recife",
+                                 partida, "2024-11-22 23:00:00+00:00", 7, status)
+
+
+@pytest.fixture
+def banco(tmp_path):
+    banco = RepositorioSQLite(str(tmp_path / "voos.db"))
+    banco.carregar()
+    yield banco
+    banco.fechar()
+
+
+def test_crud(banco):
+    banco.inserir(voo(1))
+    banco.inserir(voo(2))
+    with pytest.raises(VooDuplicado):
+        banco.inserir(voo(1))
+
+    assert banco.atualizar(1, voo(1, status="Atrasado"))
+    assert banco.obter(1).status == "Atrasado"
+    assert not banco.atualizar(3, voo(3))
+    # Trocar o id para um que já existe não pode apagar o outro voo.
+    with pytest.raises(VooDuplicado):
+        banco.atualizar(1, voo(2))
+    assert banco.obter(1).status == "Atrasado"
+
+    assert banco.deletar(2)
+    assert not banco.deletar(2)
+    assert banco.obter(2) is None
+    assert banco.contar() == 1
+
+
+def test_falha_no_lote_desfaz_so_a_operacao(banco):
+    banco.inserir(voo(1))
+    resultados = banco.aplicar_lote([
+        ("inserir", (voo(2),)),
+        ("inserir", (voo(1, status="Cancelado"),)),
+        ("atualizar", (1, voo(1, status="Atrasado"))),
+        ("deletar", (5,)),
+    ])
+
+    assert resultados[0] is None
+    assert isinstance(resultados[1], VooDuplicado)
+    assert resultados[2:] == [True, False]
+    assert [registro.id_voo for registro in banco.listar()] == [1, 2]
+    assert banco.obter(1).status == "Atrasado"
+
+
+def test_consultar_filtros_partida_e_cursor(banco):
+    # Mesmo instante em UTC escrito de jeitos diferentes, mais um antes e
+    # um depois da faixa.
+    partidas = {
+        1: "2024-11-22 08:00:00+00:00",
+        2: "2024-11-22T05:00:00-03:00",
+        3: "2024-11-22T10:00:00+02:00",
+        4: "2024-11-22T07:59:59+00:00",
+        5: "2024-11-22 09:00:01+00:00",
+    }
+    for id_voo, partida in partidas.items():
+        banco.inserir(voo(id_voo, cia="Azul" if id_voo % 2 else "Gol", partida=partida))
+
+    pagina, proximo = banco.consultar(
+        partida_de=datetime(2024, 11, 22, 8, tzinfo=timezone.utc),
+        partida_ate="2024-11-22T06:00:00-03:00")
+    assert [registro.id_voo for registro in pagina] == [1, 2, 3]
+    assert proximo is None
+
+    pagina, _ = banco.consultar({"cia": "Azul"})
+    assert [registro.id_voo for registro in pagina] == [1, 3, 5]
+    with pytest.raises(ValueError):
+        banco.consultar({"numero_voo": 101})
+
+    pagina, proximo = banco.consultar(limit=2)
+    assert [registro.id_voo for registro in pagina] == [1, 2]
+    pagina, proximo = banco.consultar(limit=2, cursor=proximo)
+    assert [registro.id_voo for registro in pagina] == [3, 4]
+    pagina, proximo = banco.consultar(limit=2, cursor=proximo)
+    assert [registro.id_voo for registro in pagina] == [5]
+    assert proximo is None
+
+
+def test_ids_fora_do_inteiro_do_banco(banco):
+    banco.inserir(voo(1))
+    grande = 99999999999999999999
+
+    assert banco.obter(grande) is None
+    assert banco.obter(-grande) is None
+    assert not banco.atualizar(grande, voo(2))
+    assert not banco.deletar(grande)
+    assert banco.consultar(cursor=grande) == ([], None)
+    assert [registro.id_voo for registro in banco.consultar(cursor=-grande)[0]] == [1]
+
+
+def test_importar_e_exportar(banco, tmp_path):
+    origem = RepositorioVoos(str(tmp_path / "origem.csv"))
+    origem.carregar()
+    for id_voo in (3, 1, 2):
+        origem.inserir(voo(id_voo, partida="2024-11-22T05:00:00-03:00"))
+
+    assert banco.importar(origem.listar()) == 3
+    # Ids que já existem são substituídos.
+    assert banco.importar([voo(2, status="Cancelado")]) == 1
+    destino = str(tmp_path / "destino.csv")
+    banco.exportar_csv(destino)
+
+    copia = RepositorioVoos(destino)
+    copia.carregar()
+    assert copia.listar() == [voo(1, partida="2024-11-22T05:00:00-03:00"),
+                              voo(2, status="Cancelado"),
+                              voo(3, partida="2024-11-22T05:00:00-03:00")]
+
+
+# A API com o SQLite por baixo. main foi importado com o armazenamento
+# padrão, então o repositório e o escritor são trocados antes do lifespan.
+def test_api_id_fora_do_inteiro_do_banco_e_404(banco, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "repositorio", banco)
+    monkeypatch.setattr(main, "escritor", EscritorVoos(banco))
+    banco.inserir(voo(1))
+
+    with TestClient(main.app) as cliente:
+        assert cliente.get("/voos/99999999999999999999").status_code == 404
+        assert cliente.delete("/voos/99999999999999999999").status_code == 404
+        assert cliente.put("/voos/99999999999999999999",
+                           json=voo(1).para_json()).status_code == 404
+        resposta = cliente.get("/voos/", params={"cursor": 99999999999999999999})
+        assert resposta.status_code == 200
+        assert resposta.json() == []